@@ -0,0 +1,327 @@
+import asyncio
+import itertools
+import json
+import logging
+import random
+import re
+
+from collections import Counter
+
+import discord
+from discord.http import Route
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+# An in-process stand-in for the Discord API. The bot keeps its real discord.py models,
+# state and listeners; only the two places that talk to the network are replaced:
+# HTTPClient.request for bot REST calls and the webhook adapter used by interaction
+# responses and followups. Every call waits a configurable latency and may be answered
+# with a 429 first, which is waited out and retried the way discord.py does. Objects
+# created over REST are announced back through the gateway parsers (CHANNEL_CREATE,
+# MESSAGE_CREATE, ...) after `gateway_ms`, so the bot's caches and listeners see the
+# same sequence of events as against Discord.
+
+PERMISSIONS_ALL = str(discord.Permissions.all().value)
+
+
+class FakeResponse:
+    # the bits of aiohttp.ClientResponse that discord.HTTPException reads
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+
+class FakeDiscord:
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 20.0, rate_limit_p: float = 0.0, retry_after: float = 0.5, gateway_ms: float = 5.0, seed: int = 0):
+        self.bot = None
+        self.state = None
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_p = rate_limit_p
+        self.retry_after = retry_after
+        self.gateway_ms = gateway_ms
+        self.random = random.Random(seed)
+
+        self._counter = itertools.count()
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.rate_limit_wait = 0.0
+
+        self.channels: dict[int, dict] = {}
+        self.messages: dict[int, list[dict]] = {}
+        self.users: dict[int, dict] = {}
+
+        # fixed before the bot is imported, so they can go into its config file
+        self.guild_id = self.snowflake()
+        self.support_role_id = self.snowflake()
+        self.ticket_category_id = self.snowflake()
+        self.log_channel_id = self.snowflake()
+        self.bot_user = self.user_payload(self.snowflake(), "ticket-bot", bot=True)
+        self._routes = [
+            (method, re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path) + "$"), getattr(self, handler))
+            for method, path, handler in (
+                ("POST", "/guilds/{guild_id}/channels", "_create_channel"),
+                ("DELETE", "/channels/{channel_id}", "_delete_channel"),
+                ("POST", "/channels/{channel_id}/messages", "_send_message"),
+                ("PATCH", "/channels/{channel_id}/messages/{message_id}", "_edit_message"),
+                ("GET", "/guilds/{guild_id}/members/{user_id}", "_get_member"),
+                ("GET", "/users/{user_id}", "_get_user"),
+                ("POST", "/users/@me/channels", "_open_dm"),
+                ("POST", "/interactions/{webhook_id}/{webhook_token}/callback", "_interaction_callback"),
+                ("POST", "/webhooks/{webhook_id}/{webhook_token}", "_execute_webhook"),
+                ("PATCH", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", "_edit_webhook_message"),
+            )
+        ]
+
+    def snowflake(self) -> int:
+        # real timestamps, so created_at and the young-channel checks behave as usual
+        return discord.utils.time_snowflake(discord.utils.utcnow()) + next(self._counter)
+
+    # ---------- setup ----------
+
+    def guild_config(self) -> dict:
+        return {
+            "guild_id": self.guild_id,
+            "ticket_category_id": self.ticket_category_id,
+            "support_role_id": self.support_role_id,
+            "log_channel_id": self.log_channel_id,
+        }
+
+    def install(self, bot) -> discord.Guild:
+        # points the bot's REST and webhook traffic here and puts the guild in its cache;
+        # must run inside the event loop that will drive the bot
+        fake = self
+
+        class Adapter(AsyncWebhookAdapter):
+            async def request(self, route, session=None, *, payload=None, multipart=None, files=None, params=None, **kwargs):
+                return await fake.request(route, json=payload, form=multipart, params=params)
+
+        self.bot = bot
+        self.state = bot._connection
+        bot.http.request = self.request
+        async_context.set(Adapter())
+
+        # the bot is the guild's only cached member, as with the minimal gateway profile
+        self.state.user = discord.ClientUser(state=self.state, data=self.bot_user)
+        self.channels[self.ticket_category_id] = self.channel_payload(self.ticket_category_id, "Tickets", 4)
+        self.channels[self.log_channel_id] = self.channel_payload(self.log_channel_id, "ticket-logs", 0)
+        return self.state._add_guild_from_data({
+            "id": str(self.guild_id),
+            "name": "Benchmark Guild",
+            "owner_id": self.bot_user["id"],
+            "roles": [self.role_payload(self.guild_id, "@everyone", 0), self.role_payload(self.support_role_id, "Support", 1)],
+            "channels": list(self.channels.values()),
+            "members": [self.member_payload(self.bot_user)],
+            "member_count": 1,
+            "features": [],
+            "emojis": [],
+            "stickers": [],
+        })
+
+    # ---------- payloads ----------
+
+    def user_payload(self, user_id: int, name: str, bot: bool = False) -> dict:
+        data = {"id": str(user_id), "username": name, "discriminator": "0", "global_name": name, "avatar": None, "bot": bot}
+        self.users[user_id] = data
+        return data
+
+    def member(self, name: str, staff: bool = False) -> dict:
+        # a new guild member, in the shape interactions carry it
+        user = self.user_payload(self.snowflake(), name)
+        return self.member_payload(user, roles=[self.support_role_id] if staff else ())
+
+    def member_payload(self, user: dict, roles=(), permissions: str = "0") -> dict:
+        return {
+            "user": user,
+            "roles": [str(r) for r in roles],
+            "joined_at": discord.utils.utcnow().isoformat(),
+            "deaf": False,
+            "mute": False,
+            "flags": 0,
+            "permissions": permissions,
+        }
+
+    def role_payload(self, role_id: int, name: str, position: int) -> dict:
+        return {"id": str(role_id), "name": name, "permissions": "0", "position": position, "color": 0, "hoist": False, "managed": False, "mentionable": False, "flags": 0}
+
+    def channel_payload(self, channel_id: int, name: str, type: int, parent_id=None, overwrites=None, position: int = 0) -> dict:
+        return {
+            "id": str(channel_id),
+            "type": type,
+            "guild_id": str(self.guild_id),
+            "name": name,
+            "position": position,
+            "parent_id": str(parent_id) if parent_id else None,
+            "permission_overwrites": overwrites or [],
+            "nsfw": False,
+            "topic": None,
+            "last_message_id": None,
+            "rate_limit_per_user": 0,
+        }
+
+    def message_payload(self, channel_id: int, author: dict, content: str = "", embeds=None, components=None, attachments=None) -> dict:
+        data = {
+            "id": str(self.snowflake()),
+            "channel_id": str(channel_id),
+            "author": author,
+            "content": content or "",
+            "timestamp": discord.utils.utcnow().isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": attachments or [],
+            "embeds": embeds or [],
+            "pinned": False,
+            "type": 0,
+            "flags": 0,
+            "components": components or [],
+        }
+        if int(channel_id) in self.channels:
+            data["guild_id"] = str(self.guild_id)
+        return data
+
+    def interaction(self, member: dict, channel_id: int, custom_id: str, message: dict | None = None, values=None) -> discord.Interaction:
+        data = {
+            "id": str(self.snowflake()),
+            "application_id": self.bot_user["id"],
+            "type": 3,
+            "token": f"token-{self.snowflake()}",
+            "version": 1,
+            "guild_id": str(self.guild_id),
+            "channel": {"id": str(channel_id), "type": 0},
+            "channel_id": str(channel_id),
+            "member": member,
+            "data": {"custom_id": custom_id, "component_type": 3 if values else 2, **({"values": values} if values else {})},
+            "app_permissions": PERMISSIONS_ALL,
+            "attachment_size_limit": 8 * 1024 * 1024,
+            "locale": "en-US",
+            "guild_locale": "en-US",
+            "entitlements": [],
+        }
+        if message:
+            data["message"] = message
+        return discord.Interaction(data=data, state=self.state)
+
+    # ---------- gateway ----------
+
+    def _gateway(self, parser: str, data: dict) -> None:
+        asyncio.get_running_loop().call_later(self.gateway_ms / 1000, getattr(self.state, parser), data)
+
+    def user_message(self, channel_id: int, member: dict, content: str) -> None:
+        # a member typing in a ticket, delivered as MESSAGE_CREATE without any REST call
+        data = self.message_payload(channel_id, member["user"], content)
+        data["member"] = {k: v for k, v in member.items() if k != "user"}
+        self.messages.setdefault(int(channel_id), []).append(data)
+        self.state.parse_message_create(data)
+
+    # ---------- REST ----------
+
+    async def request(self, route: Route, *, form=None, **kwargs):
+        path = route.url[len(Route.BASE):].split("?", 1)[0]
+        for method, pattern, handler in self._routes:
+            if method == route.method and (m := pattern.match(path)):
+                break
+        else:
+            method, handler, m = route.method, None, None
+        key = f"{route.method} {route.path}"
+        self.calls[key] += 1
+
+        while self.rate_limit_p and self.random.random() < self.rate_limit_p:
+            self.rate_limited[key] += 1
+            # reported the way discord.py reports the 429s it retries
+            if route.webhook_token:
+                logging.getLogger("discord.webhook.async_").warning("Webhook ID %s is rate limited. Retrying in %.2f seconds.", route.webhook_id, self.retry_after)
+            else:
+                logging.getLogger("discord.http").warning("We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds.", route.method, route.url, self.retry_after)
+            self.rate_limit_wait += self.retry_after
+            await asyncio.sleep(self.retry_after)
+        await asyncio.sleep(max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        if handler is None:
+            return None
+        return handler(**m.groupdict(), json=kwargs.get("json") or self._form_json(form))
+
+    @staticmethod
+    def _form_json(form) -> dict | None:
+        for part in form or ():
+            if part.get("name") == "payload_json":
+                return json.loads(part["value"])
+        return None
+
+    def _not_found(self, what: str):
+        return discord.NotFound(FakeResponse(404, "Not Found"), {"code": 10003, "message": f"Unknown {what}"})
+
+    def _create_channel(self, guild_id, json):
+        channel_id = self.snowflake()
+        data = self.channel_payload(channel_id, json["name"], json.get("type", 0), json.get("parent_id"), json.get("permission_overwrites"), json.get("position") or 0)
+        self.channels[channel_id] = data
+        self._gateway("parse_channel_create", data)
+        return data
+
+    def _delete_channel(self, channel_id, json):
+        data = self.channels.pop(int(channel_id), None)
+        if data is None:
+            raise self._not_found("Channel")
+        self.messages.pop(int(channel_id), None)
+        self._gateway("parse_channel_delete", data)
+        return data
+
+    def _send_message(self, channel_id, json):
+        json = json or {}
+        attachments = [
+            {"id": str(self.snowflake()), "filename": a.get("filename", "file"), "size": 0, "url": f"https://cdn.example/{channel_id}/{a.get('filename', 'file')}", "proxy_url": ""}
+            for a in json.get("attachments", [])
+        ]
+        data = self.message_payload(channel_id, self.bot_user, json.get("content"), json.get("embeds"), json.get("components"), attachments)
+        self.messages.setdefault(int(channel_id), []).append(data)
+        if int(channel_id) in self.channels:
+            self._gateway("parse_message_create", data)
+        return data
+
+    def _edit_message(self, channel_id, message_id, json):
+        for data in self.messages.get(int(channel_id), ()):
+            if data["id"] == message_id:
+                data.update({k: v for k, v in (json or {}).items() if k in ("content", "embeds", "components")})
+                data["edited_timestamp"] = discord.utils.utcnow().isoformat()
+                return data
+        raise self._not_found("Message")
+
+    def _get_member(self, guild_id, user_id, json):
+        user = self.users.get(int(user_id))
+        if user is None:
+            raise self._not_found("Member")
+        return self.member_payload(user)
+
+    def _get_user(self, user_id, json):
+        user = self.users.get(int(user_id))
+        if user is None:
+            raise self._not_found("User")
+        return user
+
+    def _open_dm(self, json):
+        return {"id": str(self.snowflake()), "type": 1, "recipients": [self.users[int(json["recipient_id"])]], "last_message_id": None}
+
+    def _interaction_callback(self, webhook_id, webhook_token, json):
+        return {"interaction": {"id": webhook_id, "type": 3}}
+
+    def _execute_webhook(self, webhook_id, webhook_token, json):
+        # followups are ephemeral here, so they never reach the gateway
+        json = json or {}
+        return self.message_payload(self.log_channel_id, self.bot_user, json.get("content"), json.get("embeds"))
+
+    def _edit_webhook_message(self, webhook_id, webhook_token, message_id, json):
+        json = json or {}
+        data = self.message_payload(self.log_channel_id, self.bot_user, json.get("content"), json.get("embeds"))
+        data["id"] = message_id
+        return data
+
+    # ---------- report ----------
+
+    def summary(self) -> dict:
+        return {
+            "rest_calls": sum(self.calls.values()),
+            "rate_limited": sum(self.rate_limited.values()),
+            "rate_limit_wait_s": round(self.rate_limit_wait, 2),
+            "by_route": dict(self.calls.most_common()),
+        }
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Connects once per gateway profile, each in a fresh process, and reports how long the
+# bot took to become ready and how much memory it holds once the guild caches are filled.
+# Usage: python benchmarks/gateway_profiles.py [--config config.json] [--settle 10]
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_profile(profile: str, token: str, settle: float) -> dict:
+    import asyncio
+    import discord
+    from gateway_profile import build_gateway_options
+
+    result = {"profile": profile, "rss_before_mb": round(rss_mb(), 1)}
+    started = time.perf_counter()
+    client = discord.Client(**build_gateway_options(profile))
+
+    @client.event
+    async def on_ready():
+        result["ready_s"] = round(time.perf_counter() - started, 2)
+        await asyncio.sleep(settle)
+        result["rss_ready_mb"] = round(rss_mb(), 1)
+        result["guilds"] = len(client.guilds)
+        result["cached_members"] = sum(len(g.members) for g in client.guilds)
+        result["cached_messages"] = len(client.cached_messages)
+        await client.close()
+
+    client.run(token, log_handler=None)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=os.path.join(ROOT, "config.json"))
+    parser.add_argument("--settle", type=float, default=10.0, help="seconds to wait after ready before measuring")
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        token = json.load(f)["token"]
+
+    if args.profile:
+        print(json.dumps(run_profile(args.profile, token, args.settle)))
+        return
+
+    from gateway_profile import GATEWAY_PROFILES
+
+    rows = []
+    for profile in GATEWAY_PROFILES:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--config", args.config, "--settle", str(args.settle), "--profile", profile],
+            capture_output=True, text=True, check=True,
+        )
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'profile':<10} {'ready (s)':>10} {'RSS (MB)':>10} {'members':>10} {'messages':>10}")
+    for r in rows:
+        print(f"{r['profile']:<10} {r['ready_s']:>10} {r['rss_ready_mb']:>10} {r['cached_members']:>10} {r['cached_messages']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_discord import FakeDiscord
+from gateway_profiles import rss_mb
+
+# Drives N ticket lifecycles (open from the panel, a few messages, claim, close, transcript
+# delivery) through the real bot code against the in-process fake in fake_discord.py, with
+# at most --concurrency of them in flight, and reports throughput, latency percentiles,
+# REST and store I/O counts and memory. Runs in a scratch directory, never touches the
+# real data files, and needs no token.
+# Usage: python benchmarks/ticket_flows.py [--tickets 200] [--concurrency 20] [--latency-ms 50]
+#        [--rate-limit 0.02] [--backend json|sqlite] [--json]
+
+STORE_READS = ("get_ticket", "get_open_channel_id", "open_tickets", "find_tickets", "get_last_ticket_number")
+STORE_WRITES = ("add_ticket", "update_ticket", "claim_ticket", "remove_ticket", "reserve_ticket_numbers")
+
+
+def bench_config(fake: FakeDiscord, args) -> dict:
+    with open(os.path.join(ROOT, "config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config.update(fake.guild_config())
+    config.update({
+        "token": "benchmark",
+        "store_backend": args.backend,
+        "ticket_category_ids_by_type": {},
+        "guilds": {},
+        "transcript_workers": args.transcript_workers,
+        "category_channel_limit": args.category_limit,
+        "log_flush_seconds": 0.5,
+    })
+    return config
+
+
+def count_store_io(store) -> Counter:
+    # logical calls per method, plus round trips to the store's disk thread (journal
+    # batches for the JSON store, statements for SQLite)
+    counts = Counter()
+    # calls the store makes to itself (claim_ticket -> update_ticket) are not counted
+    nested = contextvars.ContextVar("nested", default=False)
+
+    def wrap(name, key):
+        method = getattr(store, name)
+
+        async def counted(*args, **kwargs):
+            if nested.get():
+                return await method(*args, **kwargs)
+            counts[key] += 1
+            token = nested.set(True)
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                nested.reset(token)
+
+        setattr(store, name, counted)
+
+    for name in STORE_READS:
+        wrap(name, f"read.{name}")
+    for name in STORE_WRITES:
+        wrap(name, f"write.{name}")
+
+    inner = getattr(store, "inner", store)
+    disk = "_write_batch" if hasattr(inner, "_write_batch") else "_run"
+    method = getattr(inner, disk)
+
+    def disk_call(*args, **kwargs):
+        counts["disk"] += 1
+        return method(*args, **kwargs)
+
+    setattr(inner, disk, disk_call)
+    return counts
+
+
+async def ticket_flow(app, fake: FakeDiscord, ctx, n: int, ticket_type: str, staff: dict, args, flows) -> bool:
+    opener = fake.member(f"user{n}")
+    opener_id = int(opener["user"]["id"])
+
+    started = time.perf_counter()
+    with flows.span("flow.create"):
+        interaction = fake.interaction(opener, fake.log_channel_id, "ticket:type_select", values=[ticket_type])
+        await app.create_ticket(interaction, ticket_type)
+    # looked up on the store behind the I/O counter and the bot's own store timing, so the
+    # benchmark's reads are not reported
+    channel_id = await ctx.store.inner.get_open_channel_id(opener_id)
+    if not channel_id:
+        return False
+
+    for i in range(args.messages):
+        fake.user_message(channel_id, opener, f"message {i} from ticket {n}")
+        await asyncio.sleep(args.think_ms / 1000)
+
+    welcome = next(m for m in fake.messages[int(channel_id)] if m["components"])
+    with flows.span("flow.claim"):
+        await app.ticket_controls.dispatch(fake.interaction(staff, channel_id, "ticket:claim", welcome))
+    fake.user_message(channel_id, staff, f"staff reply to ticket {n}")
+    await asyncio.sleep(args.think_ms / 1000)
+
+    with flows.span("flow.close"):
+        await app.ticket_controls.dispatch(fake.interaction(staff, channel_id, "ticket:close", welcome))
+    flows.observe("flow.total", time.perf_counter() - started)
+    return True
+
+
+async def run(app, fake: FakeDiscord, args) -> dict:
+    from metrics import LatencyRecorder
+
+    # entering the client sets up its loop the way start() would, without logging in
+    async with app.bot:
+        guild = fake.install(app.bot)
+        await app.bot.setup_hook()
+        await app.load_guild_state(guild)
+        ctx = await app.guilds.get(guild.id)
+        store_io = count_store_io(ctx.store)
+
+        job_writes = Counter()
+        write = app.transcript_queue._write
+
+        def counted_write(lines, snapshot):
+            job_writes["jobs_file"] += 1
+            write(lines, snapshot)
+
+        app.transcript_queue._write = counted_write
+
+        flows = LatencyRecorder(window=max(1024, args.tickets))
+        staff = [fake.member(f"staff{i}", staff=True) for i in range(args.staff)]
+        ticket_types = ctx.config.ticket_types
+        limiter = asyncio.Semaphore(args.concurrency)
+
+        async def one(n: int) -> bool:
+            async with limiter:
+                return await ticket_flow(app, fake, ctx, n, ticket_types[n % len(ticket_types)], staff[n % len(staff)], args, flows)
+
+        rss_start = rss_mb()
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(one(n) for n in range(args.tickets)), return_exceptions=True)
+        flows_done = time.perf_counter() - started
+
+        # closes return once the ticket is queued; transcripts are delivered in the background
+        while app.transcript_queue.pending() and time.perf_counter() - started < args.drain_timeout:
+            await asyncio.sleep(0.05)
+        drained = time.perf_counter() - started
+        undelivered = app.transcript_queue.pending()
+
+    errors = [o for o in outcomes if isinstance(o, Exception)]
+    completed = sum(1 for o in outcomes if o is True)
+    for e in errors[:5]:
+        print(f"⚠️ flow failed: {e!r}", file=sys.stderr)
+
+    latency = {}
+    for recorder in (flows, app.latency):
+        for name in recorder.names():
+            p = recorder.percentiles(name)
+            latency[name] = {f"p{int(q * 100)}": round(v * 1000, 1) for q, v in p.items()} | {"n": recorder.count(name)}
+
+    return {
+        "tickets": args.tickets,
+        "completed": completed,
+        "failed": args.tickets - completed,
+        "undelivered_transcripts": undelivered,
+        "flows_s": round(flows_done, 2),
+        "drained_s": round(drained, 2),
+        "tickets_per_s": round(completed / flows_done, 2) if flows_done else 0,
+        "latency_ms": latency,
+        "rest": fake.summary(),
+        "store": dict(sorted(store_io.items())),
+        "transcript_queue": dict(job_writes),
+        "bot_metrics": {
+            "rest_calls": app.counters.total("rest_requests_total"),
+            "rate_limited": app.counters.total("rest_ratelimited_total"),
+            "rate_limit_wait_s": round(app.counters.total("rest_ratelimit_wait_seconds_total"), 2),
+        },
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_mb(), 1),
+    }
+
+
+def print_report(r: dict) -> None:
+    print(f"{r['completed']}/{r['tickets']} tickets in {r['flows_s']}s ({r['tickets_per_s']}/s), transcripts drained after {r['drained_s']}s"
+          + (f", {r['undelivered_transcripts']} undelivered" if r["undelivered_transcripts"] else ""))
+    print()
+    width = max([len(name) for name in r["latency_ms"]] + [5])
+    print(f"{'stage':<{width}} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'n':>7}")
+    for name, p in r["latency_ms"].items():
+        print(f"{name:<{width}} {p['p50']:>9} {p['p95']:>9} {p['p99']:>9} {p['n']:>7}")
+    print()
+    rest = r["rest"]
+    print(f"REST: {rest['rest_calls']} calls, {rest['rate_limited']} rate limited ({rest['rate_limit_wait_s']}s waiting)")
+    for route, n in rest["by_route"].items():
+        print(f"  {n:>7}  {route}")
+    seen = r["bot_metrics"]
+    print(f"  seen by the bot's own metrics: {seen['rest_calls']:.0f} bot REST calls, {seen['rate_limited']:.0f} rate limited ({seen['rate_limit_wait_s']}s)")
+    print(f"Store: {', '.join(f'{k} {v}' for k, v in r['store'].items())}")
+    print(f"Transcript jobs file writes: {r['transcript_queue'].get('jobs_file', 0)}")
+    mem = f"Memory: RSS {r['rss_start_mb']} → {r['rss_end_mb']} MB"
+    if "tracemalloc_peak_mb" in r:
+        mem += f", traced peak {r['tracemalloc_peak_mb']} MB"
+    print(mem)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20, help="ticket flows in flight at once")
+    parser.add_argument("--staff", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=5, help="messages the opener posts before the claim")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause after each posted message")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean REST round trip")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--gateway-ms", type=float, default=5.0, help="delay before REST changes arrive as gateway events")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="chance that a REST call is answered with a 429 first")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--transcript-workers", type=int, default=2)
+    parser.add_argument("--category-limit", type=int, default=50)
+    parser.add_argument("--close-delay", type=float, default=0.0, help="seconds before a closed channel is deleted (the bot uses 3)")
+    parser.add_argument("--drain-timeout", type=float, default=300.0)
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the traced allocation peak (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    fake = FakeDiscord(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_p=args.rate_limit,
+        retry_after=args.retry_after,
+        gateway_ms=args.gateway_ms,
+        seed=args.seed,
+    )
+
+    workdir = tempfile.mkdtemp(prefix="ticket-bench-")
+    os.chdir(workdir)
+    with open("config.json", "w", encoding="utf-8") as f:
+        json.dump(bench_config(fake, args), f)
+    os.environ["TICKET_BOT_CONFIG"] = os.path.join(workdir, "config.json")
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    import main as app
+    app.CLOSE_DELAY_SECONDS = args.close_delay
+
+    result = asyncio.run(run(app, fake, args))
+    result["workdir"] = workdir
+    if args.tracemalloc:
+        result["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
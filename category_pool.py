@@ -0,0 +1,141 @@
+import asyncio
+import re
+
+import discord
+
+CATEGORY_CHANNEL_LIMIT = 50
+
+
+def overflow_name(base_name: str, n: int) -> str:
+    return f"{base_name} (overflow {n})"
+
+def overflow_pattern(base_name: str) -> re.Pattern:
+    return re.compile(re.escape(base_name) + r" \(overflow (\d+)\)$")
+
+
+class CategoryPool:
+    # Treats a ticket category plus its "<name> (overflow N)" siblings as one pool.
+    # Channel membership per category is cached from the guild cache once and then kept
+    # current from channel create/update/delete events, so picking a category never
+    # walks the guild. Slots handed out by acquire() count as used until release(), so
+    # concurrent ticket creations cannot overfill a category before the gateway event
+    # for the new channel arrives.
+
+    def __init__(self, limit: int = CATEGORY_CHANNEL_LIMIT):
+        self.limit = limit
+        self._channels: dict[int, set[int]] = {}
+        self._pending: dict[int, int] = {}
+        self._seeded: set[int] = set()
+        self._retiring: set[int] = set()
+        # overflow categories created here, until the gateway puts them in the guild cache
+        self._created: dict[int, discord.CategoryChannel] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    # ---------- cache ----------
+
+    def seed(self, guild: discord.Guild) -> None:
+        # called when the guild becomes available, so a reconnect starts from fresh counts
+        self._seeded.add(guild.id)
+        for category in guild.categories:
+            self._channels[category.id] = set()
+        for channel in guild.channels:
+            if channel.category_id:
+                self._channels.setdefault(channel.category_id, set()).add(channel.id)
+
+    def channel_created(self, channel) -> None:
+        if isinstance(channel, discord.CategoryChannel):
+            self._channels.setdefault(channel.id, set())
+        elif channel.category_id:
+            self._channels.setdefault(channel.category_id, set()).add(channel.id)
+
+    def channel_deleted(self, channel) -> None:
+        if isinstance(channel, discord.CategoryChannel):
+            self._channels.pop(channel.id, None)
+            self._pending.pop(channel.id, None)
+            self._retiring.discard(channel.id)
+            self._created.pop(channel.id, None)
+        elif channel.category_id:
+            self._channels.get(channel.category_id, set()).discard(channel.id)
+
+    def channel_moved(self, before, after) -> None:
+        if before.category_id == after.category_id:
+            return
+        if before.category_id:
+            self._channels.get(before.category_id, set()).discard(before.id)
+        if after.category_id:
+            self._channels.setdefault(after.category_id, set()).add(after.id)
+
+    def load(self, category_id: int) -> int:
+        return len(self._channels.get(category_id, ())) + self._pending.get(category_id, 0)
+
+    # ---------- pool ----------
+
+    def members(self, guild: discord.Guild, base: discord.CategoryChannel) -> list[discord.CategoryChannel]:
+        pattern = overflow_pattern(base.name)
+        pool = {base.id: base}
+        for category in [*guild.categories, *self._created.values()]:
+            if category.guild.id == guild.id and category.id not in pool and category.id not in self._retiring and pattern.match(category.name):
+                pool[category.id] = category
+        return list(pool.values())
+
+    async def acquire(self, guild: discord.Guild, base: discord.CategoryChannel) -> discord.CategoryChannel | None:
+        if guild.id not in self._seeded:
+            self.seed(guild)
+        pool = self.members(guild, base)
+        category = min(pool, key=lambda c: (self.load(c.id), c.position))
+        if self.load(category.id) >= self.limit:
+            lock = self._locks.setdefault(base.id, asyncio.Lock())
+            async with lock:
+                # another creation may have opened an overflow while we waited
+                pool = self.members(guild, base)
+                category = min(pool, key=lambda c: (self.load(c.id), c.position))
+                if self.load(category.id) >= self.limit:
+                    category = await self._create_overflow(guild, base, pool)
+                    if category is None:
+                        return None
+        self._pending[category.id] = self._pending.get(category.id, 0) + 1
+        return category
+
+    def release(self, category_id: int, channel_id: int | None = None) -> None:
+        left = self._pending.get(category_id, 0) - 1
+        if left > 0:
+            self._pending[category_id] = left
+        else:
+            self._pending.pop(category_id, None)
+        if channel_id is not None:
+            # the gateway event may not have arrived yet; adding twice is harmless
+            self._channels.setdefault(category_id, set()).add(channel_id)
+
+    async def _create_overflow(self, guild: discord.Guild, base: discord.CategoryChannel, pool: list[discord.CategoryChannel]) -> discord.CategoryChannel | None:
+        pattern = overflow_pattern(base.name)
+        used = {int(m.group(1)) for c in pool[1:] if (m := pattern.match(c.name))}
+        n = next(i for i in range(2, len(used) + 3) if i not in used)
+        try:
+            category = await guild.create_category(
+                overflow_name(base.name, n),
+                overwrites=base.overwrites,
+                position=base.position + 1,
+                reason=f"Ticket category {base.name} is full",
+            )
+        except discord.HTTPException as e:
+            print(f"⚠️ Could not create overflow category for {base.name}: {e}")
+            return None
+        self._channels.setdefault(category.id, set())
+        self._created[category.id] = category
+        return category
+
+    def retire_if_empty(self, category) -> bool:
+        # overflow categories are removed as soon as their last ticket is gone;
+        # the caller deletes the category when this returns True
+        if not isinstance(category, discord.CategoryChannel) or category.id in self._retiring:
+            return False
+        base_name = category.name.rsplit(" (overflow ", 1)[0]
+        if base_name == category.name or not overflow_pattern(base_name).match(category.name):
+            return False
+        if self.load(category.id) > 0:
+            return False
+        self._retiring.add(category.id)
+        return True
+
+    def keep(self, category_id: int) -> None:
+        self._retiring.discard(category_id)
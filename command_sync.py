@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+
+from ticket_store import atomic_write
+
+
+def command_payload(tree, guild) -> list[dict]:
+    payload = []
+    for cmd in tree.get_commands(guild=guild):
+        try:
+            data = cmd.to_dict(tree)
+        except TypeError:
+            # discord.py < 2.4 takes no tree argument
+            data = cmd.to_dict()
+        payload.append(data)
+    return sorted(payload, key=lambda d: (d.get("type", 1), d.get("name", "")))
+
+def command_tree_hash(tree, guild) -> str:
+    data = json.dumps(command_payload(tree, guild), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CommandSyncCache:
+    # Remembers the hash of the command tree last pushed to each guild, so a reconnect
+    # only calls tree.sync() when the commands actually changed.
+
+    def __init__(self, path: str = "command_sync_cache.json"):
+        self.path = path
+        self.hashes: dict[str, str] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.hashes = json.load(f)
+            except ValueError:
+                self.hashes = {}
+
+    def is_current(self, scope, digest: str) -> bool:
+        return self.hashes.get(str(scope)) == digest
+
+    def remember(self, scope, digest: str) -> None:
+        self.hashes[str(scope)] = digest
+        atomic_write(self.path, json.dumps(self.hashes, indent=4).encode("utf-8"))
+
+    def forget(self, scope=None) -> None:
+        if scope is None:
+            self.hashes = {}
+        else:
+            self.hashes.pop(str(scope), None)
+        atomic_write(self.path, json.dumps(self.hashes, indent=4).encode("utf-8"))
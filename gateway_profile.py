@@ -0,0 +1,28 @@
+import discord
+
+# "minimal" is everything main.py needs: guild/channel/role state, messages in ticket
+# channels (with content, for transcripts) and nothing about presences, typing, voice
+# or the member list. Members are fetched on demand when they are not cached.
+GATEWAY_PROFILES = ("minimal", "full")
+
+
+def build_gateway_options(profile: str) -> dict:
+    profile = (profile or "minimal").lower()
+    if profile == "full":
+        return {
+            "intents": discord.Intents.all(),
+        }
+    if profile != "minimal":
+        raise ValueError(f"Unknown gateway_profile {profile!r}, expected one of {GATEWAY_PROFILES}")
+
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.message_content = True
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        # edits/deletes are handled through the raw events, so no message cache is needed
+        "max_messages": None,
+    }
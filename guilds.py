@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows
+    fcntl = resource = None
+    import msvcrt
+
+
+class GuildLeaseError(RuntimeError):
+    pass
+
+
+def raise_open_file_limit(wanted: int = 65536) -> int:
+    # every loaded guild keeps its lease file (and with SQLite the db, -wal and -shm)
+    # open, which outgrows the common soft limit of 1024 at a few hundred guilds
+    if resource is None:
+        return 0
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if soft != resource.RLIM_INFINITY and soft < target:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+class GuildLease:
+    # Exclusive lock file per guild. Every process that serves a guild holds its lease
+    # for as long as the guild's store is open, so two processes with overlapping shard
+    # ranges cannot both write the same ticket store. Stands in for a shared
+    # coordination service when all processes run on one host.
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def acquire(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fh = open(self.path, "a+")
+        try:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            fh.close()
+            raise GuildLeaseError(f"{self.path} is held by another process")
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(os.getpid()))
+        fh.flush()
+        self._fh = fh
+
+    def release(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+
+class GuildConfig:
+    def __init__(self, guild_id: int, raw: dict):
+        self.guild_id = int(guild_id)
+        self.raw = raw
+        self.ticket_category_id = int(raw.get("ticket_category_id") or 0)
+        self.support_role_id = int(raw.get("support_role_id") or 0)
+        self.log_channel_id = int(raw.get("log_channel_id") or 0)
+        self.ticket_types = list(raw.get("ticket_types") or ["Support", "Purchase", "Bug Report"])
+        self.category_by_type = {str(k): int(v) for k, v in (raw.get("ticket_category_ids_by_type") or {}).items()}
+        self.auto_assign = bool(raw.get("auto_assign", False))
+        self.auto_assign_max_open = int(raw.get("auto_assign_max_open") or 0)
+        self.staff_skills = {str(k): list(v) for k, v in (raw.get("staff_skills") or {}).items()}
+
+
+class GuildContext:
+    def __init__(self, config: GuildConfig, store, numbers, stats, lease: GuildLease):
+        self.guild_id = config.guild_id
+        self.config = config
+        self.store = store
+        self.numbers = numbers
+        self.stats = stats
+        self.lease = lease
+        # set on load when auto_assign is on
+        self.assigner = None
+
+    async def close(self) -> None:
+        try:
+            await self.stats.close()
+            await self.store.close()
+        finally:
+            self.lease.release()
+
+
+class GuildRegistry:
+    # Per-guild settings and state, loaded the first time a guild is touched and cached
+    # afterwards. Settings are the top-level config.json values, overridden by the
+    # guild's entry under "guilds" and then by <config_dir>/<guild_id>.json if present.
+    # Each guild gets its own ticket store, number counter and stats under
+    # <data_dir>/<guild_id>/; the primary guild keeps the original file locations.
+
+    def __init__(self, base_config: dict, primary_guild_id: int, open_context, config_dir: str = "./guild_configs", data_dir: str = "./guild_data", on_load=None):
+        self.base_config = base_config
+        self.primary_guild_id = int(primary_guild_id or 0)
+        self.open_context = open_context
+        self.config_dir = config_dir
+        self.data_dir = data_dir
+        self.on_load = on_load
+
+        self._configs: dict[int, GuildConfig] = {}
+        self._contexts: dict[int, GuildContext] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def config(self, guild_id) -> GuildConfig:
+        guild_id = int(guild_id)
+        cfg = self._configs.get(guild_id)
+        if cfg is None:
+            raw = {k: v for k, v in self.base_config.items() if k != "guilds"}
+            raw.update((self.base_config.get("guilds") or {}).get(str(guild_id), {}))
+            path = os.path.join(self.config_dir, f"{guild_id}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    raw.update(json.load(f))
+            cfg = self._configs[guild_id] = GuildConfig(guild_id, raw)
+        return cfg
+
+    def data_path(self, guild_id, filename: str) -> str:
+        if int(guild_id) == self.primary_guild_id:
+            return filename
+        return os.path.join(self.data_dir, str(int(guild_id)), os.path.basename(filename))
+
+    def peek(self, guild_id) -> GuildContext | None:
+        return self._contexts.get(int(guild_id))
+
+    def loaded(self) -> list[GuildContext]:
+        return list(self._contexts.values())
+
+    async def get(self, guild_id) -> GuildContext:
+        guild_id = int(guild_id)
+        ctx = self._contexts.get(guild_id)
+        if ctx is not None:
+            return ctx
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            ctx = self._contexts.get(guild_id)
+            if ctx is not None:
+                return ctx
+            lease = GuildLease(os.path.join(self.data_dir, "leases", f"{guild_id}.lock"))
+            await asyncio.to_thread(lease.acquire)
+            try:
+                if guild_id != self.primary_guild_id:
+                    os.makedirs(os.path.join(self.data_dir, str(guild_id)), exist_ok=True)
+                store, numbers, stats = await asyncio.to_thread(self.open_context, self, guild_id)
+                ctx = GuildContext(self.config(guild_id), store, numbers, stats, lease)
+                if self.on_load:
+                    await self.on_load(ctx)
+            except Exception:
+                lease.release()
+                raise
+            self._contexts[guild_id] = ctx
+        return ctx
+
+    async def close(self) -> None:
+        contexts, self._contexts = list(self._contexts.values()), {}
+        for ctx in contexts:
+            try:
+                await ctx.close()
+            except Exception as e:
+                print(f"⚠️ Could not close state for guild {ctx.guild_id}: {e}")
@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import time
+
+
+class InactivityScheduler:
+    # One timer task over a min-heap of (deadline, channel_id), at most one live item
+    # per ticket. Activity only moves `last` forward, which never makes a deadline
+    # earlier, so touch() is O(1): the item is re-pushed for the new deadline when it
+    # comes up (O(log n)). The only exception is activity after a warning, whose next
+    # warning can fall before the pending close. Forgotten tickets leave stale heap items
+    # behind that are skipped when popped and dropped when the heap is rebuilt.
+    # With auto-close off there is no timer, but last activity is still kept per ticket
+    # for /bulkclose and persisted through touch().
+
+    def __init__(self, on_warn, on_close, warn_after: float, close_after: float, persist_every: float = 60.0):
+        self.on_warn = on_warn
+        self.on_close = on_close
+        self.warn_after = warn_after
+        self.close_after = close_after
+        self.persist_every = persist_every
+
+        self._entries: dict[str, dict] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._callbacks: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.close_after > 0
+
+    async def start(self) -> None:
+        if self._task or not self.enabled:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------- tickets ----------
+
+    def track(self, channel_id, guild_id, last_activity: float, warned: float | None = None) -> None:
+        channel_id = str(channel_id)
+        entry = {"guild_id": str(guild_id), "last": float(last_activity), "warned": warned, "persisted": float(last_activity), "due": 0.0}
+        self._entries[channel_id] = entry
+        if self.enabled:
+            self._schedule(channel_id, entry)
+
+    def forget(self, channel_id) -> None:
+        self._entries.pop(str(channel_id), None)
+
+    def touch(self, channel_id, ts: float | None = None) -> dict | None:
+        # returns the fields worth persisting, at most once per `persist_every` seconds
+        # per ticket, and always when the activity cancels a warning
+        entry = self._entries.get(str(channel_id))
+        if entry is None:
+            return None
+        ts = ts or time.time()
+        if ts <= entry["last"]:
+            return None
+        entry["last"] = ts
+        fields = {}
+        if entry["warned"]:
+            entry["warned"] = None
+            fields["inactivity_warned"] = None
+            due = self._due(entry)
+            if self.enabled and due < entry["due"]:
+                self._schedule(str(channel_id), entry)
+        if fields or ts - entry["persisted"] >= self.persist_every:
+            entry["persisted"] = ts
+            fields["last_activity"] = ts
+        return fields or None
+
+    def last_activity(self, channel_id) -> float | None:
+        entry = self._entries.get(str(channel_id))
+        return entry["last"] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---------- timer ----------
+
+    def _due(self, entry: dict) -> float:
+        if entry["warned"] or self.warn_after <= 0:
+            # a warning always gets the full grace period, even if the bot was down
+            grace = self.close_after - max(self.warn_after, 0)
+            return max(entry["last"] + self.close_after, (entry["warned"] or 0) + grace)
+        return entry["last"] + self.warn_after
+
+    def _schedule(self, channel_id: str, entry: dict) -> None:
+        entry["due"] = self._due(entry)
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(e["due"], cid) for cid, e in self._entries.items() if cid != channel_id]
+            heapq.heapify(self._heap)
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (entry["due"], channel_id))
+        if self._wake and (earliest is None or entry["due"] < earliest):
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                await self._wake.wait()
+                self._wake.clear()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            deadline, channel_id = heapq.heappop(self._heap)
+            entry = self._entries.get(channel_id)
+            if entry is None or entry["due"] != deadline:
+                continue
+            now = time.time()
+            if self._due(entry) > now:
+                # there was activity since this was scheduled
+                self._schedule(channel_id, entry)
+                continue
+
+            if not entry["warned"] and self.warn_after > 0:
+                entry["warned"] = now
+                self._schedule(channel_id, entry)
+                self._spawn(self.on_warn(entry["guild_id"], channel_id, entry["due"]))
+            else:
+                del self._entries[channel_id]
+                self._spawn(self.on_close(entry["guild_id"], channel_id, entry["last"]))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._callbacks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"⚠️ Inactivity callback failed: {task.exception()!r}")
@@ -0,0 +1,227 @@
+import asyncio
+import html
+import json
+import os
+
+from datetime import datetime, timezone
+
+
+def message_event(message) -> dict:
+    return {
+        "t": "msg",
+        "id": str(message.id),
+        "ts": message.created_at.timestamp(),
+        "author_id": str(message.author.id),
+        "author": str(message.author),
+        "bot": bool(getattr(message.author, "bot", False)),
+        "content": message.content or "",
+        "attachments": [
+            {"filename": a.filename, "url": a.url, "size": a.size}
+            for a in message.attachments
+        ],
+        "embeds": [
+            {"title": e.title, "description": e.description}
+            for e in message.embeds
+            if e.title or e.description
+        ],
+    }
+
+
+class LiveTranscriptLog:
+    # One append-only JSON-lines file per open ticket channel, fed from gateway events.
+    # Appends are buffered in memory and written by a background flush off the loop.
+    # Channels tracked since they were created in this process have a complete log;
+    # channels picked up at startup may have missed messages while the bot was down and
+    # report needs_backfill() until the caller has filled the gap from history, starting
+    # after the last message logged before the restart (backfill_cursor()).
+
+    def __init__(self, log_dir: str = "./transcript_logs", flush_interval: float = 0.5):
+        self.log_dir = log_dir
+        self.flush_interval = flush_interval
+        self._tracked: set[str] = set()
+        self._complete: set[str] = set()
+        self._resumed_at: dict[str, int] = {}
+        self._pending: dict[str, list[str]] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._write_lock = asyncio.Lock()
+
+    def _path(self, channel_id) -> str:
+        return os.path.join(self.log_dir, f"{channel_id}.jsonl")
+
+    # ---------- tracking ----------
+
+    def track(self, channel_id, complete: bool = False) -> None:
+        channel_id = str(channel_id)
+        self._tracked.add(channel_id)
+        if complete:
+            self._complete.add(channel_id)
+
+    def untrack(self, channel_id) -> None:
+        self._tracked.discard(str(channel_id))
+
+    def is_tracked(self, channel_id) -> bool:
+        return str(channel_id) in self._tracked
+
+    def needs_backfill(self, channel_id) -> bool:
+        return str(channel_id) not in self._complete
+
+    def mark_complete(self, channel_id) -> None:
+        self._complete.add(str(channel_id))
+        self._resumed_at.pop(str(channel_id), None)
+
+    async def resume(self, channel_ids) -> None:
+        # remember where each existing log ended before any live append lands after it
+        channel_ids = [str(c) for c in channel_ids]
+        sizes = await asyncio.to_thread(lambda: {c: _size(self._path(c)) for c in channel_ids})
+        for channel_id in channel_ids:
+            self._resumed_at[channel_id] = sizes[channel_id]
+            self.track(channel_id)
+
+    async def backfill_cursor(self, channel_id) -> int | None:
+        # newest message id logged before the restart; None means fetch the whole history
+        channel_id = str(channel_id)
+        limit = self._resumed_at.get(channel_id, 0)
+        if not limit:
+            return None
+        return last_message_id(await asyncio.to_thread(self._read, self._path(channel_id), limit))
+
+    # ---------- writing ----------
+
+    def append(self, channel_id, event: dict) -> None:
+        self._pending.setdefault(str(channel_id), []).append(json.dumps(event, separators=(",", ":")) + "\n")
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        async with self._write_lock:
+            pending, self._pending = self._pending, {}
+            if pending:
+                await asyncio.to_thread(self._write, pending)
+
+    def _write(self, pending: dict[str, list[str]]) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        for channel_id, lines in pending.items():
+            with open(self._path(channel_id), "a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    # ---------- reading ----------
+
+    async def read(self, channel_id) -> list[dict]:
+        await self.flush()
+        return await asyncio.to_thread(self._read, self._path(channel_id))
+
+    @staticmethod
+    def _read(path: str, limit: int | None = None) -> list[dict]:
+        # limit: only the first `limit` bytes of the log
+        if not os.path.exists(path):
+            return []
+        events = []
+        with open(path, "rb") as f:
+            for line in f:
+                if limit is not None:
+                    limit -= len(line)
+                    if limit < 0:
+                        break
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+        return events
+
+    async def discard(self, channel_id) -> None:
+        channel_id = str(channel_id)
+        self.untrack(channel_id)
+        self._complete.discard(channel_id)
+        self._resumed_at.pop(channel_id, None)
+        await self.flush()
+        try:
+            await asyncio.to_thread(os.remove, self._path(channel_id))
+        except FileNotFoundError:
+            pass
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def last_message_id(events: list[dict]) -> int | None:
+    ids = [int(e["id"]) for e in events if e.get("t") == "msg"]
+    return max(ids) if ids else None
+
+def fold_events(events: list[dict]) -> list[dict]:
+    messages: dict[str, dict] = {}
+    for e in events:
+        kind = e.get("t")
+        if kind == "msg":
+            messages.setdefault(e["id"], dict(e))
+        elif kind == "edit" and e.get("id") in messages:
+            messages[e["id"]]["content"] = e.get("content", "")
+            messages[e["id"]]["edited"] = e.get("ts")
+        elif kind == "del" and e.get("id") in messages:
+            messages[e["id"]]["deleted"] = e.get("ts")
+    return sorted(messages.values(), key=lambda m: int(m["id"]))
+
+def transcript_text(events: list[dict]) -> str:
+    lines = []
+    for m in fold_events(events):
+        parts = [m.get("content", "")]
+        parts.extend(f"{e.get('title') or ''} {e.get('description') or ''}" for e in m.get("embeds", []))
+        parts.extend(a.get("filename", "") for a in m.get("attachments", []))
+        lines.append(f"{m.get('author', '')}: " + " ".join(p for p in parts if p))
+    return "\n".join(lines)
+
+def _fmt_ts(ts: float | None) -> str:
+    if not ts:
+        return ""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+def render_html(events: list[dict], channel_name: str, guild_name: str = "") -> str:
+    messages = fold_events(events)
+    rows = []
+    for m in messages:
+        classes = "msg"
+        if m.get("deleted"):
+            classes += " deleted"
+        body = html.escape(m.get("content", "")).replace("\n", "<br>")
+        for e in m.get("embeds", []):
+            title = html.escape(e.get("title") or "")
+            desc = html.escape(e.get("description") or "").replace("\n", "<br>")
+            body += f'<div class="embed"><b>{title}</b><div>{desc}</div></div>'
+        for a in m.get("attachments", []):
+            body += f'<div class="att"><a href="{html.escape(a.get("url", ""), quote=True)}">{html.escape(a.get("filename", "file"))}</a> ({int(a.get("size") or 0)} bytes)</div>'
+        notes = []
+        if m.get("edited"):
+            notes.append(f"edited {_fmt_ts(m['edited'])}")
+        if m.get("deleted"):
+            notes.append(f"deleted {_fmt_ts(m['deleted'])}")
+        note = f' <span class="note">({", ".join(notes)})</span>' if notes else ""
+        author = html.escape(m.get("author", m.get("author_id", "")))
+        if m.get("bot"):
+            author += ' <span class="bot">BOT</span>'
+        rows.append(
+            f'<div class="{classes}"><div class="head"><span class="author">{author}</span>'
+            f' <span class="ts">{_fmt_ts(m.get("ts"))}</span>{note}</div><div class="body">{body}</div></div>'
+        )
+
+    title = html.escape(f"{guild_name} / #{channel_name}" if guild_name else f"#{channel_name}")
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>{title}</title>"
+        "<style>"
+        "body{background:#313338;color:#dbdee1;font-family:sans-serif;margin:0;padding:16px}"
+        ".msg{padding:6px 0;border-bottom:1px solid #3f4147}.author{font-weight:bold;color:#f2f3f5}"
+        ".ts,.note{color:#949ba4;font-size:12px}.bot{background:#5865f2;color:#fff;font-size:10px;padding:1px 4px;border-radius:3px}"
+        ".embed{border-left:4px solid #1e1f22;background:#2b2d31;padding:6px 10px;margin-top:4px}"
+        ".deleted .body{text-decoration:line-through;opacity:.6}a{color:#00a8fc}"
+        "</style></head><body>"
+        f"<h2>{title}</h2><p>{len(messages)} messages</p>"
+        + "".join(rows) +
+        "</body></html>"
+    )
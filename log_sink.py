@@ -0,0 +1,99 @@
+import asyncio
+import itertools
+
+LOG_CRITICAL = 0
+LOG_INFO = 1
+LOG_WARNING = 2
+
+MAX_EMBEDS_PER_MESSAGE = 10
+
+
+class LogSink:
+    # Buffers log embeds per channel and sends them as multi-embed messages, either when
+    # a channel has a full message's worth queued or every `flush_interval` seconds.
+    # The backlog is bounded; when it overflows, warnings are dropped first, then info,
+    # and critical entries only once nothing else is left.
+
+    def __init__(self, get_channel, flush_interval: float = 2.0, max_backlog: int = 200):
+        self.get_channel = get_channel
+        self.flush_interval = flush_interval
+        self.max_backlog = max(MAX_EMBEDS_PER_MESSAGE, int(max_backlog))
+        self.dropped = 0
+
+        self._buffers: dict[int, list[tuple[int, int, object]]] = {}
+        self._size = 0
+        self._seq = itertools.count()
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush_all()
+
+    def post(self, channel_id: int, embed, level: int = LOG_INFO) -> None:
+        self._buffers.setdefault(int(channel_id), []).append((level, next(self._seq), embed))
+        self._size += 1
+        while self._size > self.max_backlog:
+            self._shed()
+        if self._wake and len(self._buffers[int(channel_id)]) >= MAX_EMBEDS_PER_MESSAGE:
+            self._wake.set()
+
+    def _shed(self) -> None:
+        # drop the oldest entry of the least important level present
+        victim = None
+        for channel_id, entries in self._buffers.items():
+            for i, (level, seq, _) in enumerate(entries):
+                key = (-level, seq)
+                if victim is None or key < victim[0]:
+                    victim = (key, channel_id, i)
+        if victim is None:
+            return
+        _, channel_id, i = victim
+        del self._buffers[channel_id][i]
+        self._size -= 1
+        self.dropped += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush_all()
+
+    async def flush_all(self) -> None:
+        for channel_id in list(self._buffers):
+            while self._buffers.get(channel_id):
+                if not await self._flush_one(channel_id):
+                    break
+
+    async def _flush_one(self, channel_id: int) -> bool:
+        entries = self._buffers[channel_id]
+        batch = entries[:MAX_EMBEDS_PER_MESSAGE]
+        del entries[:MAX_EMBEDS_PER_MESSAGE]
+        self._size -= len(batch)
+
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            return True
+        try:
+            await channel.send(embeds=[e for _, _, e in batch])
+        except Exception as e:
+            # keep the batch for the next tick; the backlog bound still applies
+            print(f"⚠️ Log flush to {channel_id} failed: {e}")
+            entries[:0] = batch
+            self._size += len(batch)
+            while self._size > self.max_backlog:
+                self._shed()
+            return False
+        return True
@@ -1,63 +1,195 @@
 import json
 import os
-import io
 import asyncio
+import time
 import discord
-import chat_exporter
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 from discord import app_commands
 from discord.ext import commands
 
-with open("config.json", "r", encoding="utf-8") as f:
+from ticket_store import TicketStore, TicketNumberAllocator
+from sqlite_store import SqliteTicketStore
+from transcripts import TranscriptQueue, TranscriptArtifact, PRIORITY_FORCED, PRIORITY_NORMAL
+from transcript_archive import TranscriptArchive
+from ticket_stats import TicketStats, quantile
+from log_sink import LogSink, LOG_CRITICAL, LOG_WARNING
+from metrics import LatencyRecorder, CounterSet, InstrumentedStore, MetricsServer, RateLimitLogHandler, instrument_http, render_prometheus
+from command_sync import CommandSyncCache, command_tree_hash
+from gateway_profile import build_gateway_options
+from guilds import GuildRegistry, GuildLeaseError, raise_open_file_limit
+from category_pool import CategoryPool, CATEGORY_CHANNEL_LIMIT
+from inactivity import InactivityScheduler
+from reconcile import diff_tickets, parse_ticket_channel, guess_opener
+from staff_queue import StaffAssigner
+from live_transcripts import LiveTranscriptLog, message_event, render_html, transcript_text
+
+# importing this module only reads configuration; nothing connects until bot.run()
+CONFIG_FILE = os.environ.get("TICKET_BOT_CONFIG", "config.json")
+
+with open(CONFIG_FILE, "r", encoding="utf-8") as f:
     CONFIG = json.load(f)
 
 TOKEN = CONFIG["token"]
-GUILD_ID = int(CONFIG["guild_id"])
-TICKET_CATEGORY_ID = int(CONFIG["ticket_category_id"])
-SUPPORT_ROLE_ID = int(CONFIG["support_role_id"])
-LOG_CHANNEL_ID = int(CONFIG["log_channel_id"])
+# the primary guild keeps the original tickets.json / tickets.db / stats file locations;
+# every other guild gets its own copies under guild_data_dir
+GUILD_ID = int(CONFIG.get("guild_id") or 0)
 
 TICKETS_DB_FILE = "tickets.json"
-ticket_lock = asyncio.Lock()
+
+STORE_BACKEND = str(CONFIG.get("store_backend", "json")).lower()
+STORE_COMPACT_EVERY = int(CONFIG.get("store_compact_every", 500))
+SQLITE_DB_FILE = CONFIG.get("sqlite_path", "tickets.db")
+TICKET_NUMBER_BLOCK_SIZE = int(CONFIG.get("ticket_number_block_size", 20))
+STATS_EVENTS_FILE = CONFIG.get("stats_events_file", "ticket_events.jsonl")
+STATS_STATE_FILE = CONFIG.get("stats_state_file", "ticket_stats.json")
+STAFF_ROSTER_FILE = CONFIG.get("staff_roster_file", "staff_duty.json")
+
+def parse_shard_ids(value) -> list[int] | None:
+    if value in (None, "", []):
+        return None
+    if isinstance(value, str):
+        value = [v for v in value.replace(" ", "").split(",") if v]
+    return [int(v) for v in value]
+
+# one process may run a subset of the shards, e.g. shard_count 4 with
+# TICKET_BOT_SHARD_IDS=0,1 in one process and TICKET_BOT_SHARD_IDS=2,3 in another
+SHARD_COUNT = int(os.environ.get("TICKET_BOT_SHARD_COUNT") or CONFIG.get("shard_count") or 0) or None
+SHARD_IDS = parse_shard_ids(os.environ.get("TICKET_BOT_SHARD_IDS") or CONFIG.get("shard_ids"))
+if SHARD_IDS and not SHARD_COUNT:
+    raise ValueError("shard_ids needs shard_count to be set")
+
+# processes sharing a directory keep their own job queue and sync cache files
+INSTANCE_NAME = os.environ.get("TICKET_BOT_INSTANCE") or CONFIG.get("instance_name") or (
+    "shards-" + "-".join(str(i) for i in SHARD_IDS) if SHARD_IDS else ""
+)
+
+def instance_path(path: str) -> str:
+    if not INSTANCE_NAME:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{INSTANCE_NAME}{ext}"
+
+# one disk thread for every guild's ticket store instead of one per guild
+store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ticket-store")
+
+def open_guild_state(registry: GuildRegistry, guild_id: int):
+    # runs in a worker thread; the stores read their files on construction
+    if STORE_BACKEND == "sqlite":
+        store = SqliteTicketStore(registry.data_path(guild_id, SQLITE_DB_FILE), import_from=registry.data_path(guild_id, TICKETS_DB_FILE), executor=store_executor)
+    else:
+        store = TicketStore(registry.data_path(guild_id, TICKETS_DB_FILE), compact_every=STORE_COMPACT_EVERY, executor=store_executor)
+    store = InstrumentedStore(store, latency, counters)
+    numbers = TicketNumberAllocator(store, block_size=TICKET_NUMBER_BLOCK_SIZE)
+    stats = TicketStats(registry.data_path(guild_id, STATS_EVENTS_FILE), registry.data_path(guild_id, STATS_STATE_FILE))
+    return store, numbers, stats
+
+async def on_guild_state_loaded(ctx) -> None:
+    open_tickets = await ctx.store.open_tickets()
+    now = time.time()
+    await live_logs.resume(ticket["channel_id"] for ticket in open_tickets)
+    for ticket in open_tickets:
+        inactivity.track(
+            ticket["channel_id"],
+            ctx.guild_id,
+            ticket.get("last_activity") or ticket.get("opened_at") or now,
+            warned=ticket.get("inactivity_warned"),
+        )
+    if ctx.stats.fresh:
+        ctx.stats.seed_open(open_tickets)
+    if ctx.config.auto_assign:
+        ctx.assigner = StaffAssigner(
+            guilds.data_path(ctx.guild_id, STAFF_ROSTER_FILE),
+            ctx.config.ticket_types,
+            skills=ctx.config.staff_skills,
+            max_open=ctx.config.auto_assign_max_open,
+        )
+        await asyncio.to_thread(ctx.assigner.load_roster, open_tickets)
+
+guilds = GuildRegistry(
+    CONFIG,
+    GUILD_ID,
+    open_guild_state,
+    config_dir=CONFIG.get("guild_config_dir", "./guild_configs"),
+    data_dir=CONFIG.get("guild_data_dir", "./guild_data"),
+    on_load=on_guild_state_loaded,
+)
+
+# (guild id, user id) pairs with a create_ticket in flight; checked and set before the first await
+opening_users: set[tuple[int, int]] = set()
+
+# "minimal" skips presences, typing, voice and the member list; "full" is Intents.all()
+GATEWAY_PROFILE = str(CONFIG.get("gateway_profile", "minimal")).lower()
+
+command_sync_cache = CommandSyncCache(instance_path(CONFIG.get("command_sync_cache_file", "command_sync_cache.json")))
+FORCE_COMMAND_SYNC = bool(CONFIG.get("force_command_sync", False)) or os.environ.get("TICKET_BOT_FORCE_SYNC") == "1"
+# commands are global, so only one process needs to push them
+SYNCS_COMMANDS = not SHARD_IDS or 0 in SHARD_IDS
+
+# shared persistent views, created in setup_hook
+ticket_panel = None
+ticket_controls = None
 
 SAVE_TRANSCRIPTS = bool(CONFIG.get("save_transcripts", False))
 TRANSCRIPTS_DIR = CONFIG.get("transcripts_dir", "./transcripts")
-
-TICKET_TYPES = CONFIG.get("ticket_types", ["Support", "Purchase", "Bug Report"])
-CATEGORY_BY_TYPE_RAW = CONFIG.get("ticket_category_ids_by_type", {}) or {}
-CATEGORY_BY_TYPE = {str(k): int(v) for k, v in CATEGORY_BY_TYPE_RAW.items()}
-
-def save_transcript_to_disk(channel_name: str, html: str) -> str:
-    os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
-    path = os.path.join(TRANSCRIPTS_DIR, f"transcript-{channel_name}.html")
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(html)
-    return path
-
-def load_tickets_db() -> dict:
-    if not os.path.exists(TICKETS_DB_FILE):
-        return {
-            "last_ticket_number": 0,
-            "open_tickets_by_user": {},
-            "tickets_by_channel": {}
-        }
-    with open(TICKETS_DB_FILE, "r", encoding="utf-8") as f:
-        db = json.load(f)
-    db.setdefault("last_ticket_number", 0)
-    db.setdefault("open_tickets_by_user", {})
-    db.setdefault("tickets_by_channel", {})
-    return db
-
-def save_tickets_db(db: dict) -> None:
-    with open(TICKETS_DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(db, f, indent=4)
-
-async def get_next_ticket_number() -> int:
-    async with ticket_lock:
-        db = load_tickets_db()
-        db["last_ticket_number"] = int(db.get("last_ticket_number", 0)) + 1
-        save_tickets_db(db)
-        return db["last_ticket_number"]
+TRANSCRIPT_RETENTION_DAYS = float(CONFIG.get("transcript_retention_days", 0) or 0)
+TRANSCRIPT_ARCHIVE_MAX_MB = float(CONFIG.get("transcript_archive_max_mb", 0) or 0)
+
+archive = TranscriptArchive(
+    TRANSCRIPTS_DIR,
+    max_age_days=TRANSCRIPT_RETENTION_DAYS,
+    max_total_bytes=int(TRANSCRIPT_ARCHIVE_MAX_MB * 1024 * 1024),
+)
+
+TRANSCRIPT_WORKERS = int(CONFIG.get("transcript_workers", 2))
+TRANSCRIPT_MAX_ATTEMPTS = int(CONFIG.get("transcript_max_attempts", 5))
+TRANSCRIPT_JOBS_FILE = instance_path(CONFIG.get("transcript_jobs_file", "transcript_jobs.json"))
+TRANSCRIPT_SPOOL_DIR = instance_path(CONFIG.get("transcript_spool_dir", "./transcript_spool"))
+TRANSCRIPT_COMPRESS = bool(CONFIG.get("transcript_compress", False))
+# "link" points the DM at the copy already uploaded to the log channel, "attach" re-uploads it
+TRANSCRIPT_DM_MODE = str(CONFIG.get("transcript_dm_mode", "link")).lower()
+CLOSE_DELAY_SECONDS = 3
+
+RECONCILE_ON_STARTUP = bool(CONFIG.get("reconcile_on_startup", True))
+# "archive" closes tickets whose channel is gone through the normal close flow (close log,
+# whatever transcript was recorded); "purge" just drops the records
+RECONCILE_ORPHANS = str(CONFIG.get("reconcile_orphans", "archive")).lower()
+
+# tickets /bulkclose closes at once; each one waits for its transcript capture
+BULK_CLOSE_CONCURRENCY = max(1, int(CONFIG.get("bulk_close_concurrency", 3)))
+
+# 0 disables; the close timer counts from the last message, the warning comes first
+INACTIVITY_WARN_HOURS = float(CONFIG.get("inactivity_warn_hours", 0) or 0)
+INACTIVITY_CLOSE_HOURS = float(CONFIG.get("inactivity_close_hours", 0) or 0)
+
+category_pool = CategoryPool(int(CONFIG.get("category_channel_limit", CATEGORY_CHANNEL_LIMIT)))
+
+live_logs = LiveTranscriptLog(CONFIG.get("transcript_logs_dir", "./transcript_logs"))
+latency = LatencyRecorder()
+counters = CounterSet()
+rate_limit_log = RateLimitLogHandler(counters)
+
+# 0 disables; the endpoint only listens on 127.0.0.1
+METRICS_PORT = int(CONFIG.get("metrics_port", 0) or 0)
+metrics_server = MetricsServer(
+    lambda: render_prometheus(latency, counters, {
+        "guilds_loaded": lambda: len(guilds.loaded()),
+        "transcript_jobs_pending": lambda: transcript_queue.pending(),
+        "inactivity_tracked_tickets": lambda: len(inactivity),
+    }),
+    METRICS_PORT,
+)
+
+log_sink = LogSink(
+    lambda channel_id: bot.get_channel(channel_id),
+    flush_interval=float(CONFIG.get("log_flush_seconds", 2.0)),
+    max_backlog=int(CONFIG.get("log_max_backlog", 200)),
+)
+
+async def get_next_ticket_number(ctx) -> int:
+    return await ctx.numbers.next()
 
 def format_ticket_name(n: int) -> str:
     return f"ticket-{n:04d}"
@@ -65,22 +197,174 @@ def format_ticket_name(n: int) -> str:
 def safe_slug(s: str) -> str:
     return "".join(ch.lower() if ch.isalnum() else "-" for ch in s).strip("-").replace("--", "-")
 
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix=".?", intents=intents)
+def fit_lines(lines: list[str], limit: int = 4000) -> str:
+    out, size = [], 0
+    for i, line in enumerate(lines):
+        if size + len(line) + 1 > limit - 20:
+            out.append(f"…and {len(lines) - i} more")
+            break
+        out.append(line)
+        size += len(line) + 1
+    return "\n".join(out)
+
+def is_staff(member) -> bool:
+    # interaction and message payloads carry the member's role IDs, so this works
+    # without the member list being cached
+    if not isinstance(member, discord.Member):
+        return False
+    return member.get_role(guilds.config(member.guild.id).support_role_id) is not None
+
+async def get_or_fetch_member(guild: discord.Guild, user_id: int) -> discord.Member | None:
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    try:
+        return await guild.fetch_member(user_id)
+    except discord.NotFound:
+        return None
+
+class TicketBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        global ticket_panel, ticket_controls
+        # views need a running loop, so the shared instances are built here, once
+        ticket_panel = TicketPanelView(guilds.config(GUILD_ID).ticket_types)
+        ticket_controls = TicketInsideView()
+        self.add_view(ticket_panel)
+        self.add_view(ticket_controls)
+
+        instrument_http(self.http, latency, counters)
+        rate_limit_log.install()
+        raise_open_file_limit()
+
+        await transcript_queue.start()
+        await archive.start()
+        await inactivity.start()
+        await log_sink.start()
+        if METRICS_PORT:
+            await metrics_server.start()
+            print(f"📈 Metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+
+    async def close(self):
+        await metrics_server.stop()
+        await inactivity.stop()
+        # deliveries in flight still post to the log sink, which still needs the client
+        await transcript_queue.stop()
+        await log_sink.stop()
+        await super().close()
+        await live_logs.flush()
+        await archive.close()
+        await guilds.close()
+        await asyncio.to_thread(store_executor.shutdown)
+
+bot = TicketBot(
+    command_prefix=".?",
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
+    **build_gateway_options(GATEWAY_PROFILE),
+)
+
+async def sync_commands() -> bool:
+    synced = False
+    digest = command_tree_hash(bot.tree, None)
+    if FORCE_COMMAND_SYNC or not command_sync_cache.is_current("global", digest):
+        await bot.tree.sync()
+        await asyncio.to_thread(command_sync_cache.remember, "global", digest)
+        synced = True
+
+    # commands used to be registered to the primary guild only; drop that copy once,
+    # including for installs that never had a sync cache
+    legacy = f"legacy_guild_commands:{GUILD_ID}"
+    if GUILD_ID and not command_sync_cache.is_current(legacy, "cleared"):
+        guild = discord.Object(id=GUILD_ID)
+        bot.tree.clear_commands(guild=guild)
+        await bot.tree.sync(guild=guild)
+        await asyncio.to_thread(command_sync_cache.remember, legacy, "cleared")
+        if str(GUILD_ID) in command_sync_cache.hashes:
+            await asyncio.to_thread(command_sync_cache.forget, GUILD_ID)
+        synced = True
+    return synced
 
 @bot.event
 async def on_ready():
-    guild = discord.Object(id=GUILD_ID)
-    bot.tree.copy_global_to(guild=guild)
-    await bot.tree.sync(guild=guild)
+    # on_ready fires again after every reconnect; nothing here may assume it runs once
+    if SYNCS_COMMANDS and await sync_commands():
+        print("🔄 Synced application commands")
+    print(f"✅ Logged in as {bot.user} (ID: {bot.user.id}) on shards {sorted(bot.shards)}")
+
+@bot.listen("on_guild_available")
+async def load_guild_state(guild: discord.Guild):
+    category_pool.seed(guild)
     try:
-        bot.add_view(TicketPanelView())
-    except Exception:
+        ctx = await guilds.get(guild.id)
+    except GuildLeaseError as e:
+        print(f"⚠️ Not serving guild {guild.id}: {e}")
+        return
+    if RECONCILE_ON_STARTUP:
+        await reconcile_guild(guild, ctx)
+
+async def retire_overflow_category(category) -> None:
+    if not category_pool.retire_if_empty(category):
+        return
+    try:
+        await category.delete(reason="Overflow ticket category is empty")
+    except discord.NotFound:
         pass
-    print(f"✅ Logged in as {bot.user} (ID: {bot.user.id})")
+    except discord.HTTPException as e:
+        category_pool.keep(category.id)
+        print(f"⚠️ Could not remove empty category {category.name}: {e}")
+
+@bot.listen("on_guild_channel_create")
+async def track_channel_create(channel: discord.abc.GuildChannel):
+    category_pool.channel_created(channel)
+
+@bot.listen("on_guild_channel_update")
+async def track_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    category_pool.channel_moved(before, after)
+    if before.category_id != after.category_id and before.category:
+        await retire_overflow_category(before.category)
+
+@bot.listen("on_guild_channel_delete")
+async def track_channel_delete(channel: discord.abc.GuildChannel):
+    category_pool.channel_deleted(channel)
+    inactivity.forget(channel.id)
+    if channel.category:
+        await retire_overflow_category(channel.category)
+
+@bot.listen("on_message")
+async def record_ticket_message(message: discord.Message):
+    if message.guild and live_logs.is_tracked(message.channel.id):
+        live_logs.append(message.channel.id, message_event(message))
+        ctx = guilds.peek(message.guild.id)
+        if ctx and not message.author.bot:
+            fields = inactivity.touch(message.channel.id, message.created_at.timestamp())
+            if fields:
+                await ctx.store.update_ticket(str(message.channel.id), **fields)
+        if (
+            ctx
+            and not message.author.bot
+            and ctx.stats.needs_response(message.channel.id)
+            and is_staff(message.author)
+        ):
+            ctx.stats.record("response", channel_id=str(message.channel.id), staff_id=str(message.author.id))
+
+@bot.listen("on_raw_message_edit")
+async def record_ticket_edit(payload: discord.RawMessageUpdateEvent):
+    if not live_logs.is_tracked(payload.channel_id) or "content" not in payload.data:
+        return
+    live_logs.append(payload.channel_id, {
+        "t": "edit",
+        "id": str(payload.message_id),
+        "ts": time.time(),
+        "content": payload.data.get("content") or "",
+    })
+
+@bot.listen("on_raw_message_delete")
+async def record_ticket_delete(payload: discord.RawMessageDeleteEvent):
+    if live_logs.is_tracked(payload.channel_id):
+        live_logs.append(payload.channel_id, {"t": "del", "id": str(payload.message_id), "ts": time.time()})
 
 def build_ticket_overwrites(guild: discord.Guild, opener: discord.Member) -> dict:
-    support_role = guild.get_role(SUPPORT_ROLE_ID)
+    support_role = guild.get_role(guilds.config(guild.id).support_role_id)
     overwrites = {
         guild.default_role: discord.PermissionOverwrite(view_channel=False),
         opener: discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True),
@@ -91,12 +375,13 @@ def build_ticket_overwrites(guild: discord.Guild, opener: discord.Member) -> dic
     return overwrites
 
 def get_category_for_type(guild: discord.Guild, ticket_type: str):
-    cat_id = CATEGORY_BY_TYPE.get(ticket_type, TICKET_CATEGORY_ID)
+    cfg = guilds.config(guild.id)
+    cat_id = cfg.category_by_type.get(ticket_type, cfg.ticket_category_id)
     ch = guild.get_channel(int(cat_id)) if cat_id else None
     return ch if isinstance(ch, discord.CategoryChannel) else None
 
-def build_ticket_embed(ticket_no: int, opener: discord.Member, ticket_type: str) -> discord.Embed:
-    return discord.Embed(
+def build_ticket_embed(ticket_no: int, opener: discord.Member, ticket_type: str, assignee_id: str | None = None) -> discord.Embed:
+    e = discord.Embed(
         title=f"🎫 {ticket_type} Ticket #{ticket_no}",
         description=(
             f"Hi {opener.mention}! Explain your issue and a staff member will respond.\n\n"
@@ -104,6 +389,10 @@ def build_ticket_embed(ticket_no: int, opener: discord.Member, ticket_type: str)
         ),
         color=0x2b2d31
     )
+    if assignee_id:
+        e.add_field(name="Status", value="Claimed", inline=True)
+        e.add_field(name="Claimed by", value=f"<@{assignee_id}>", inline=True)
+    return e
 
 def build_open_log(channel: discord.TextChannel, opener: discord.Member, ticket_type: str) -> discord.Embed:
     e = discord.Embed(
@@ -118,80 +407,445 @@ def build_open_log(channel: discord.TextChannel, opener: discord.Member, ticket_
     e.set_footer(text="Ticket System")
     return e
 
-def build_close_log(channel: discord.TextChannel, opener_id: int, claimed_by_text: str, closed_by: discord.Member, transcript_ok: bool, ticket_type: str) -> discord.Embed:
+def build_close_log(channel_name: str, opener_id: int, claimed_by_text: str, closed_by_id: int, transcript_ok: bool, ticket_type: str) -> discord.Embed:
     e = discord.Embed(
         title="🔴 Ticket Closed",
         color=0x2b2d31,
         timestamp=discord.utils.utcnow()
     )
-    e.add_field(name="Ticket", value=channel.name, inline=True)
+    e.add_field(name="Ticket", value=channel_name, inline=True)
     e.add_field(name="Opened by", value=f"<@{opener_id}>", inline=True)
     e.add_field(name="Type", value=ticket_type, inline=True)
     e.add_field(name="Claimed by", value=claimed_by_text, inline=True)
-    e.add_field(name="Closed by", value=closed_by.mention, inline=True)
+    e.add_field(name="Closed by", value=f"<@{closed_by_id}>", inline=True)
     e.add_field(name="Transcript", value="✅ Attached" if transcript_ok else "❌ Failed", inline=False)
     e.set_footer(text="Ticket System")
     return e
 
+def build_warning_log(text: str) -> discord.Embed:
+    e = discord.Embed(
+        description=text,
+        color=0xf0b232,
+        timestamp=discord.utils.utcnow()
+    )
+    e.set_footer(text="Ticket System")
+    return e
+
+def build_close_dm(guild: discord.Guild | None, channel_name: str, forced: bool, transcript_url: str | None = None) -> discord.Embed:
+    if forced:
+        intro = f"Your support ticket **{channel_name}** has been force-closed by staff.\n\n"
+    else:
+        intro = f"Your support ticket **{channel_name}** has been successfully closed.\n\n"
+    send_embed = discord.Embed(
+        title="🎫 Ticket Closed",
+        description=(
+            intro +
+            "📄 **Transcript**\n" +
+            (
+                f"A full transcript of the conversation is available [here]({transcript_url}) for your records."
+                if transcript_url else
+                "A full transcript of the conversation is attached for your records."
+            )
+        ),
+        color=0x2b2d31
+    )
+    send_embed.timestamp = discord.utils.utcnow()
+    if guild and guild.icon:
+        send_embed.set_thumbnail(url=guild.icon.url)
+    send_embed.set_footer(text="Thank you for contacting support")
+    return send_embed
+
+async def capture_transcript(job: dict) -> str | None:
+    channel_id = job["channel_id"]
+    channel = bot.get_channel(int(channel_id))
+    events = await latency.timed("transcript.read", live_logs.read(channel_id))
+
+    # only tickets that were open while the bot was offline need a history call, and
+    # then only for the messages after the last one logged before the restart
+    if isinstance(channel, discord.TextChannel) and live_logs.needs_backfill(channel_id):
+        last_id = await live_logs.backfill_cursor(channel_id)
+        after = discord.Object(id=last_id) if last_id else None
+        with latency.span("transcript.backfill"):
+            async for message in channel.history(limit=None, after=after, oldest_first=True):
+                live_logs.append(channel_id, message_event(message))
+        live_logs.mark_complete(channel_id)
+        events = await live_logs.read(channel_id)
+
+    if not events:
+        return None
+    guild = bot.get_guild(int(job["guild_id"]))
+    return await latency.timed("transcript.render", asyncio.to_thread(render_html, events, job["channel_name"], guild.name if guild else ""))
+
+async def deliver_transcript(job: dict, artifact: TranscriptArtifact | None) -> None:
+    guild = bot.get_guild(int(job["guild_id"]))
+    log_ch = guild.get_channel(guilds.config(guild.id).log_channel_id) if guild else None
+    channel_name = job["channel_name"]
+    opener_id = int(job["opener_id"])
+    done = job["done"]
+
+    # every close is searchable by its details; message text is only kept (in the blob
+    # and the full-text index) when saving transcripts is on
+    if "disk" not in done:
+        try:
+            text = None
+            if SAVE_TRANSCRIPTS:
+                events = await live_logs.read(job["channel_id"])
+                text = await asyncio.to_thread(transcript_text, events) if events else None
+            meta = {
+                "ticket_number": job.get("ticket_number"),
+                "guild_id": job["guild_id"],
+                "channel_id": job["channel_id"],
+                "channel_name": channel_name,
+                "opener_id": job["opener_id"],
+                "claimed_by": job.get("claimed_by"),
+                "type": job.get("ticket_type"),
+                "closed_at": job.get("created_at"),
+            }
+            if artifact and SAVE_TRANSCRIPTS:
+                await latency.timed("transcript.archive", archive.store(artifact, meta, text=text))
+            else:
+                await latency.timed("transcript.index", archive.index(meta, text=text))
+        except Exception as e:
+            print(f"⚠️ Could not archive transcript for {channel_name}: {e}")
+        done.append("disk")
+
+    if "log" not in done:
+        claimed_by = job.get("claimed_by")
+        close_log = build_close_log(
+            channel_name=channel_name,
+            opener_id=opener_id,
+            claimed_by_text=f"<@{claimed_by}>" if claimed_by else "Not claimed",
+            closed_by_id=int(job["closed_by_id"]),
+            transcript_ok=bool(artifact),
+            ticket_type=job.get("ticket_type", "Unknown")
+        )
+        if isinstance(log_ch, discord.TextChannel):
+            if artifact:
+                # transcript-bearing entries skip the batched sink so the DM can link the upload
+                log_msg = await latency.timed("transcript.log_upload", log_ch.send(embed=close_log, file=discord.File(artifact.open(), filename=artifact.filename)))
+                if log_msg.attachments:
+                    artifact.url = job["transcript_url"] = log_msg.attachments[0].url
+            else:
+                log_sink.post(log_ch.id, close_log, LOG_CRITICAL)
+        done.append("log")
+
+    if artifact and "dm" not in done:
+        try:
+            with latency.span("transcript.fetch_user"):
+                opener_member = await get_or_fetch_member(guild, opener_id) if guild else None
+                opener_user = opener_member if opener_member else await bot.fetch_user(opener_id)
+
+            with latency.span("transcript.dm"):
+                if TRANSCRIPT_DM_MODE == "link" and artifact.url:
+                    await opener_user.send(embed=build_close_dm(guild, channel_name, job.get("forced", False), artifact.url))
+                else:
+                    dm_file = discord.File(artifact.open(), filename=artifact.filename)
+                    await opener_user.send(embed=build_close_dm(guild, channel_name, job.get("forced", False)), file=dm_file)
+
+        except discord.Forbidden:
+            if isinstance(log_ch, discord.TextChannel):
+                log_sink.post(log_ch.id, build_warning_log(f"⚠️ Could not DM transcript to <@{opener_id}> (DMs closed)."), LOG_WARNING)
+        except discord.HTTPException as e:
+            if e.status >= 500 or e.status == 429:
+                raise
+            if isinstance(log_ch, discord.TextChannel):
+                log_sink.post(log_ch.id, build_warning_log(f"⚠️ Failed to DM transcript to <@{opener_id}>: {e}"), LOG_WARNING)
+        except Exception as e:
+            if isinstance(log_ch, discord.TextChannel):
+                log_sink.post(log_ch.id, build_warning_log(f"⚠️ Failed to DM transcript to <@{opener_id}>: {e}"), LOG_WARNING)
+        done.append("dm")
+
+    await live_logs.discard(job["channel_id"])
+
+async def delete_closed_channel(job: dict) -> None:
+    remaining = job.get("created_at", 0) + CLOSE_DELAY_SECONDS - time.time()
+    if remaining > 0:
+        await latency.timed("close.delay", asyncio.sleep(remaining))
+    channel = bot.get_channel(int(job["channel_id"]))
+    if channel is None:
+        return
+    try:
+        await latency.timed("close.delete", channel.delete(reason=job.get("reason")))
+    except discord.NotFound:
+        pass
+
+transcript_queue = TranscriptQueue(
+    lambda job: latency.timed("transcript.capture", capture_transcript(job)),
+    lambda job, artifact: latency.timed("transcript.deliver", deliver_transcript(job, artifact)),
+    on_captured=delete_closed_channel,
+    jobs_file=TRANSCRIPT_JOBS_FILE,
+    spool_dir=TRANSCRIPT_SPOOL_DIR,
+    workers=TRANSCRIPT_WORKERS,
+    max_attempts=TRANSCRIPT_MAX_ATTEMPTS,
+    compress=TRANSCRIPT_COMPRESS,
+)
+
+async def drop_ticket(ctx, ticket: dict, closed_by: discord.abc.User, forced: bool) -> bool:
+    # the bookkeeping half of a close; False if another close got there first
+    channel_id = str(ticket["channel_id"])
+    inactivity.forget(channel_id)
+    if await ctx.store.remove_ticket(channel_id) is None:
+        return False
+    if ctx.assigner:
+        ctx.assigner.released(ticket.get("claimed_by"))
+    ctx.stats.record(
+        "close",
+        channel_id=channel_id,
+        closed_by=str(closed_by.id),
+        claimed_by=ticket.get("claimed_by"),
+        type=ticket.get("type"),
+        forced=forced,
+    )
+    return True
+
+async def request_close(guild: discord.Guild, channel: discord.abc.Snowflake, ticket: dict, closed_by: discord.abc.User, forced: bool, reason: str, span: str = "close") -> asyncio.Future | None:
+    # Every close (button, /forceclose, /bulkclose, inactivity) goes through here. The
+    # ticket leaves the store right away and the job carries everything the transcript
+    # needs. Returns a future that resolves once the transcript is captured (True) or
+    # given up on (False), or None if the ticket was already being closed. `channel` may
+    # be a bare discord.Object when the channel itself no longer exists. Its stages are
+    # timed as `<span>.drop` and `<span>.queue`.
+    ctx = await guilds.get(guild.id)
+    channel_name = getattr(channel, "name", None) or format_ticket_name(int(ticket.get("ticket_number") or 0))
+    if not await latency.timed(f"{span}.drop", drop_ticket(ctx, ticket, closed_by, forced)):
+        return None
+    return await latency.timed(f"{span}.queue", transcript_queue.submit({
+        "guild_id": str(guild.id),
+        "channel_id": str(channel.id),
+        "channel_name": channel_name,
+        "ticket_number": ticket.get("ticket_number"),
+        "opener_id": str(ticket.get("opener_id")),
+        "ticket_type": ticket.get("type", "Unknown"),
+        "claimed_by": ticket.get("claimed_by"),
+        "closed_by_id": str(closed_by.id),
+        "forced": forced,
+        "reason": reason,
+    }, priority=PRIORITY_FORCED if forced else PRIORITY_NORMAL))
+
+def format_hours(hours: float) -> str:
+    if hours % 24 == 0:
+        days = int(hours // 24)
+        return f"{days} day" + ("s" if days != 1 else "")
+    return f"{hours:g} hour" + ("s" if hours != 1 else "")
+
+async def warn_inactive_ticket(guild_id: str, channel_id: str, close_at: float) -> None:
+    channel = bot.get_channel(int(channel_id))
+    ctx = await guilds.get(guild_id)
+    ticket = await ctx.store.get_ticket(channel_id)
+    if not ticket or not isinstance(channel, discord.TextChannel):
+        inactivity.forget(channel_id)
+        return
+    await ctx.store.update_ticket(channel_id, inactivity_warned=time.time())
+    await channel.send(
+        f"⏰ <@{ticket.get('opener_id')}> this ticket has had no activity for {format_hours(INACTIVITY_WARN_HOURS)}. "
+        f"It will be closed automatically <t:{int(close_at)}:R> unless someone replies."
+    )
+
+async def close_inactive_ticket(guild_id: str, channel_id: str, last_activity: float) -> None:
+    guild = bot.get_guild(int(guild_id))
+    channel = guild.get_channel(int(channel_id)) if guild else None
+    if not isinstance(channel, discord.TextChannel):
+        return
+    ctx = await guilds.get(guild_id)
+    ticket = await ctx.store.get_ticket(channel_id)
+    if not ticket:
+        return
+    await request_close(
+        guild,
+        channel,
+        ticket,
+        closed_by=bot.user,
+        forced=False,
+        reason=f"Closed automatically after {format_hours(INACTIVITY_CLOSE_HOURS)} without activity",
+        span="autoclose",
+    )
+
+inactivity = InactivityScheduler(
+    warn_inactive_ticket,
+    close_inactive_ticket,
+    warn_after=INACTIVITY_WARN_HOURS * 3600,
+    close_after=INACTIVITY_CLOSE_HOURS * 3600,
+    persist_every=float(CONFIG.get("inactivity_persist_seconds", 60)),
+)
+
+async def adopt_ticket_channel(guild: discord.Guild, ctx, channel: discord.TextChannel) -> dict | None:
+    parsed = parse_ticket_channel(channel.name, ctx.config.ticket_types, safe_slug)
+    opener_id = guess_opener(channel, {bot.user.id}, discord.Role)
+    if not parsed or not opener_id:
+        return None
+    ticket_no, ticket_type = parsed
+    opened_at = channel.created_at.timestamp()
+    last_activity = discord.utils.snowflake_time(channel.last_message_id).timestamp() if channel.last_message_id else opened_at
+    ticket = await ctx.store.add_ticket({
+        "ticket_number": ticket_no,
+        "channel_id": str(channel.id),
+        "opener_id": str(opener_id),
+        "type": ticket_type,
+        "claimed_by": None,
+        "status": "open",
+        "opened_at": opened_at,
+        "last_activity": last_activity,
+        "adopted_at": time.time(),
+    })
+    ctx.numbers.skip_past(ticket_no)
+    live_logs.track(channel.id)
+    inactivity.track(channel.id, guild.id, last_activity)
+    ctx.stats.record("seed", channel_id=str(channel.id), type=ticket_type, ts=opened_at)
+    return ticket
+
+async def reconcile_guild(guild: discord.Guild, ctx) -> None:
+    # Compares the store with the channels already in the guild cache; no REST calls
+    # except for the closes and the report themselves.
+    open_tickets = await ctx.store.open_tickets()
+    fresh_after = discord.utils.utcnow().timestamp() - 120
+    skip_ids = {job.get("channel_id") for job in transcript_queue.jobs.values()}
+    # channels this young may belong to a create_ticket that has not stored its record yet
+    skip_ids.update(str(c.id) for c in guild.text_channels if c.created_at.timestamp() > fresh_after)
+    orphans, strays = diff_tickets(open_tickets, guild.text_channels, skip_ids)
+    if not orphans and not strays:
+        return
+
+    removed = []
+    for ticket in orphans:
+        label = f"#{ticket.get('ticket_number', '?')} (<@{ticket.get('opener_id')}>)"
+        if RECONCILE_ORPHANS == "purge":
+            if await drop_ticket(ctx, ticket, bot.user, forced=True):
+                await live_logs.discard(ticket["channel_id"])
+                removed.append(label)
+        else:
+            closing = await request_close(
+                guild,
+                discord.Object(id=int(ticket["channel_id"])),
+                ticket,
+                closed_by=bot.user,
+                forced=True,
+                reason="Ticket channel no longer exists",
+                span="reconcile",
+            )
+            if closing is not None:
+                removed.append(label)
+
+    adopted, skipped = [], []
+    for channel in strays:
+        ticket = await adopt_ticket_channel(guild, ctx, channel)
+        (adopted if ticket else skipped).append(channel.mention)
+
+    lines = []
+    if removed:
+        verb = "Purged" if RECONCILE_ORPHANS == "purge" else "Archived and closed"
+        lines.append(f"**{verb} {len(removed)} tickets whose channel is gone:** " + ", ".join(removed))
+    if adopted:
+        lines.append(f"**Adopted {len(adopted)} ticket channels missing from the store:** " + ", ".join(adopted))
+    if skipped:
+        lines.append("**Could not adopt (no opener found):** " + ", ".join(skipped))
+    print(f"🧭 Reconciled guild {guild.id}: {len(removed)} orphaned, {len(adopted)} adopted, {len(skipped)} skipped")
+
+    log_ch = guild.get_channel(ctx.config.log_channel_id)
+    if isinstance(log_ch, discord.TextChannel):
+        e = discord.Embed(
+            title="🧭 Ticket Reconciliation",
+            description=fit_lines(lines),
+            color=0x2b2d31,
+            timestamp=discord.utils.utcnow()
+        )
+        e.set_footer(text="Ticket System")
+        log_sink.post(log_ch.id, e, LOG_WARNING)
+
 async def create_ticket(interaction: discord.Interaction, ticket_type: str):
     if not interaction.guild or not isinstance(interaction.user, discord.Member):
         return await interaction.response.send_message("This only works in a server.", ephemeral=True)
 
-    await interaction.response.defer(ephemeral=True)
+    if ticket_type not in guilds.config(interaction.guild.id).ticket_types:
+        return await interaction.response.send_message("That ticket type is not available here.", ephemeral=True)
+
+    key = (interaction.guild.id, interaction.user.id)
+    if key in opening_users:
+        return await interaction.response.send_message("Your ticket is already being created.", ephemeral=True)
+
+    opening_users.add(key)
+    try:
+        return await _create_ticket(interaction, ticket_type)
+    finally:
+        opening_users.discard(key)
+
+async def _create_ticket(interaction: discord.Interaction, ticket_type: str):
+    started = time.perf_counter()
+    await latency.timed("create.defer", interaction.response.defer(ephemeral=True))
 
     guild = interaction.guild
     opener = interaction.user
+    ctx = await guilds.get(guild.id)
 
-    category = get_category_for_type(guild, ticket_type)
-    if not category:
+    base_category = get_category_for_type(guild, ticket_type)
+    if not base_category:
         return await interaction.followup.send("Ticket category is not set correctly for this type.", ephemeral=True)
 
-    db = load_tickets_db()
-    user_key = str(opener.id)
-    existing_channel_id = db.get("open_tickets_by_user", {}).get(user_key)
+    existing_channel_id = await ctx.store.get_open_channel_id(opener.id)
     if existing_channel_id:
         ch = guild.get_channel(int(existing_channel_id))
         if isinstance(ch, discord.TextChannel):
             return await interaction.followup.send(f"You already have a ticket: {ch.mention}", ephemeral=True)
 
     overwrites = build_ticket_overwrites(guild, opener)
-    ticket_no = await get_next_ticket_number()
+    ticket_no = await latency.timed("create.number", get_next_ticket_number(ctx))
 
     channel_name = f"{format_ticket_name(ticket_no)}-{safe_slug(ticket_type)}"
-    channel = await guild.create_text_channel(
-        name=channel_name,
-        category=category,
-        overwrites=overwrites,
-        reason=f"Ticket #{ticket_no} ({ticket_type}) opened by {opener} ({opener.id})",
-    )
-
-    db = load_tickets_db()
-    db.setdefault("open_tickets_by_user", {})[str(opener.id)] = str(channel.id)
-    db.setdefault("tickets_by_channel", {})[str(channel.id)] = {
-        "ticket_number": ticket_no,
-        "channel_id": str(channel.id),
-        "opener_id": str(opener.id),
-        "type": ticket_type,
-        "claimed_by": None,
-        "status": "open"
-    }
-    save_tickets_db(db)
+    category = await latency.timed("create.category", category_pool.acquire(guild, base_category))
+    if not category:
+        return await interaction.followup.send("All ticket categories for this type are full. Please try again later.", ephemeral=True)
+    try:
+        channel = await latency.timed("create.channel", guild.create_text_channel(
+            name=channel_name,
+            category=category,
+            overwrites=overwrites,
+            reason=f"Ticket #{ticket_no} ({ticket_type}) opened by {opener} ({opener.id})",
+        ))
+    except Exception:
+        category_pool.release(category.id)
+        raise
+    category_pool.release(category.id, channel.id)
 
-    embed = build_ticket_embed(ticket_no, opener, ticket_type)
-    await channel.send(
-        content=f"{opener.mention}",
-        embed=embed,
-        view=TicketInsideView(opener_id=opener.id),
-    )
+    # start recording before anyone can post in the channel
+    live_logs.track(channel.id, complete=True)
+    inactivity.track(channel.id, guild.id, time.time())
+    ctx.stats.record("open", channel_id=str(channel.id), ticket_number=ticket_no, opener_id=str(opener.id), type=ticket_type)
 
-    log_ch = guild.get_channel(LOG_CHANNEL_ID)
+    log_ch = guild.get_channel(ctx.config.log_channel_id)
     if isinstance(log_ch, discord.TextChannel):
-        await log_ch.send(embed=build_open_log(channel, opener, ticket_type))
+        log_sink.post(log_ch.id, build_open_log(channel, opener, ticket_type), LOG_CRITICAL)
+
+    # least-loaded on-duty staff member, or nobody and the ticket waits for a manual claim
+    assignee = ctx.assigner.assign(ticket_type) if ctx.assigner else None
+    if assignee:
+        ctx.stats.record("claim", channel_id=str(channel.id), staff_id=assignee, auto=True)
+
+    # the user only waits for the channel; everything else runs alongside the followup
+    results = await asyncio.gather(
+        latency.timed("create.followup", interaction.followup.send(f"✅ Ticket created: {channel.mention}", ephemeral=True)),
+        latency.timed("create.welcome", channel.send(
+            content=f"{opener.mention}" + (f" • assigned to <@{assignee}>" if assignee else ""),
+            embed=build_ticket_embed(ticket_no, opener, ticket_type, assignee),
+            view=ticket_controls,
+        )),
+        latency.timed("create.persist", ctx.store.add_ticket({
+            "ticket_number": ticket_no,
+            "channel_id": str(channel.id),
+            "opener_id": str(opener.id),
+            "type": ticket_type,
+            "claimed_by": assignee,
+            "status": "claimed" if assignee else "open",
+            "opened_at": time.time()
+        })),
+        return_exceptions=True,
+    )
+    latency.observe("create.total", time.perf_counter() - started)
 
-    return await interaction.followup.send(f"✅ Ticket created: {channel.mention}", ephemeral=True)
+    for stage, result in zip(("followup", "welcome message", "store write"), results):
+        if isinstance(result, Exception):
+            print(f"⚠️ Ticket #{ticket_no} {stage} failed: {result!r}")
 
 class TicketTypeSelect(discord.ui.Select):
-    def __init__(self):
+    def __init__(self, ticket_types: list[str]):
         emoji_map = {
             "Support": "🎫",
             "Purchase": "💳",
@@ -203,7 +857,7 @@ class TicketTypeSelect(discord.ui.Select):
                 value=t,
                 emoji=emoji_map.get(t),
             )
-            for t in TICKET_TYPES
+            for t in ticket_types[:25]
         ]
         super().__init__(
             placeholder="Select a ticket type…",
@@ -218,178 +872,117 @@ class TicketTypeSelect(discord.ui.Select):
         await create_ticket(interaction, ticket_type)
 
 class TicketPanelView(discord.ui.View):
-    def __init__(self):
+    # the instance registered at startup handles selections on every guild's panel;
+    # /panel posts a copy listing that guild's own types under the same custom_id
+    def __init__(self, ticket_types: list[str]):
         super().__init__(timeout=None)
-        self.add_item(TicketTypeSelect())
+        self.add_item(TicketTypeSelect(ticket_types))
 
-class TicketInsideView(discord.ui.View):
-    def __init__(self, opener_id: int):
-        super().__init__(timeout=None)
-        self.opener_id = opener_id
+async def handle_claim(interaction: discord.Interaction, ctx, ticket: dict):
+    started = time.perf_counter()
+    channel_id = str(interaction.channel.id)
 
-    @discord.ui.button(label="Claim Ticket", style=discord.ButtonStyle.blurple, emoji="✅", custom_id="ticket:claim")
-    async def claim_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not interaction.guild or not interaction.channel:
-            return await interaction.response.send_message("This only works in a server.", ephemeral=True)
+    if not is_staff(interaction.user):
+        return await interaction.response.send_message("Only support staff can claim tickets.", ephemeral=True)
 
-        guild = interaction.guild
-        channel_id = str(interaction.channel.id)
+    claimed, ticket = await latency.timed("claim.store", ctx.store.claim_ticket(channel_id, interaction.user.id))
+    if not ticket:
+        return await interaction.response.send_message("Ticket data not found.", ephemeral=True)
 
-        support_role = guild.get_role(SUPPORT_ROLE_ID)
-        is_staff = support_role in getattr(interaction.user, "roles", []) if support_role else False
-        if not is_staff:
-            return await interaction.response.send_message("Only support staff can claim tickets.", ephemeral=True)
+    if not claimed:
+        return await interaction.response.send_message(f"This ticket is already claimed by <@{ticket.get('claimed_by')}>.", ephemeral=True)
 
-        db = load_tickets_db()
-        ticket = db["tickets_by_channel"].get(channel_id)
-        if not ticket:
-            return await interaction.response.send_message("Ticket data not found.", ephemeral=True)
+    ctx.stats.record("claim", channel_id=channel_id, staff_id=str(interaction.user.id))
+    if ctx.assigner:
+        ctx.assigner.claimed(interaction.user.id)
 
-        claimed_by = ticket.get("claimed_by")
-        if claimed_by is not None:
-            return await interaction.response.send_message(f"This ticket is already claimed by <@{claimed_by}>.", ephemeral=True)
+    updated_embed = interaction.message.embeds[0].copy() if interaction.message and interaction.message.embeds else discord.Embed(title="🎫 Support Ticket", color=0x2b2d31)
+    has_status = any((f.name or "").lower() == "status" for f in updated_embed.fields)
+    has_claimed = any((f.name or "").lower() == "claimed by" for f in updated_embed.fields)
 
-        ticket["claimed_by"] = str(interaction.user.id)
-        ticket["status"] = "claimed"
-        db["tickets_by_channel"][channel_id] = ticket
-        save_tickets_db(db)
+    if not has_status:
+        updated_embed.add_field(name="Status", value="Claimed", inline=True)
+    if not has_claimed:
+        updated_embed.add_field(name="Claimed by", value=interaction.user.mention, inline=True)
 
-        updated_embed = interaction.message.embeds[0].copy() if interaction.message and interaction.message.embeds else discord.Embed(title="🎫 Support Ticket", color=0x2b2d31)
-        has_status = any((f.name or "").lower() == "status" for f in updated_embed.fields)
-        has_claimed = any((f.name or "").lower() == "claimed by" for f in updated_embed.fields)
+    await latency.timed("claim.respond", interaction.response.send_message("✅ Ticket claimed.", ephemeral=True))
+    try:
+        await latency.timed("claim.edit", interaction.message.edit(embed=updated_embed, view=ticket_controls))
+    except Exception:
+        pass
+    latency.observe("claim.total", time.perf_counter() - started)
 
-        if not has_status:
-            updated_embed.add_field(name="Status", value="Claimed", inline=True)
-        if not has_claimed:
-            updated_embed.add_field(name="Claimed by", value=interaction.user.mention, inline=True)
+async def handle_close(interaction: discord.Interaction, ctx, ticket: dict):
+    started = time.perf_counter()
+    guild = interaction.guild
+    channel = interaction.channel
+
+    staff = is_staff(interaction.user)
+    is_opener = str(interaction.user.id) == str(ticket.get("opener_id"))
+    is_admin = interaction.user.guild_permissions.manage_channels
+
+    if not (staff or is_opener or is_admin):
+        return await interaction.response.send_message("You don’t have permission to close this ticket.", ephemeral=True)
+
+    claimed_by = ticket.get("claimed_by")
+    user_id = str(interaction.user.id)
+    if claimed_by is not None:
+        if claimed_by != user_id and not is_admin:
+            return await interaction.response.send_message(
+                f"This ticket is claimed by <@{claimed_by}>. Only they (or an admin) can close it.",
+                ephemeral=True
+            )
 
-        await interaction.response.send_message("✅ Ticket claimed.", ephemeral=True)
-        try:
-            await interaction.message.edit(embed=updated_embed, view=self)
-        except Exception:
-            pass
+    await latency.timed("close.defer", interaction.response.defer(ephemeral=True))
+    closing = await request_close(
+        guild,
+        channel,
+        ticket,
+        closed_by=interaction.user,
+        forced=False,
+        reason=f"Ticket closed by {interaction.user} ({interaction.user.id})",
+    )
+    if closing is None:
+        return await interaction.followup.send("This ticket is already being closed.", ephemeral=True)
+    await latency.timed("close.followup", interaction.followup.send(f"Closing ticket in {CLOSE_DELAY_SECONDS} seconds...", ephemeral=True))
+    latency.observe("close.total", time.perf_counter() - started)
 
-    @discord.ui.button(label="Close Ticket", style=discord.ButtonStyle.red, emoji="🔒", custom_id="ticket:close")
-    async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not interaction.guild or not interaction.channel:
-            return await interaction.response.send_message("This only works in a server.", ephemeral=True)
+TICKET_ACTIONS = {
+    "ticket:claim": handle_claim,
+    "ticket:close": handle_close,
+}
 
-        guild = interaction.guild
-        channel = interaction.channel
-        channel_id = str(channel.id)
+class TicketInsideView(discord.ui.View):
+    # One instance is registered at startup and attached to every ticket's welcome
+    # message. It holds no per-ticket state: each click is resolved to its ticket
+    # through the store by channel ID, so it keeps working across restarts.
 
-        support_role = guild.get_role(SUPPORT_ROLE_ID)
-        is_staff = support_role in getattr(interaction.user, "roles", []) if support_role else False
-        is_opener = interaction.user.id == self.opener_id
-        is_admin = interaction.user.guild_permissions.manage_channels
+    def __init__(self):
+        super().__init__(timeout=None)
 
-        if not (is_staff or is_opener or is_admin):
-            return await interaction.response.send_message("You don’t have permission to close this ticket.", ephemeral=True)
+    async def dispatch(self, interaction: discord.Interaction):
+        if not interaction.guild or not interaction.channel:
+            return await interaction.response.send_message("This only works in a server.", ephemeral=True)
 
-        db = load_tickets_db()
-        ticket = db["tickets_by_channel"].get(channel_id)
+        ctx = await guilds.get(interaction.guild.id)
+        ticket = await ctx.store.get_ticket(interaction.channel.id)
         if not ticket:
-            return await interaction.response.send_message("Ticket data missing.", ephemeral=True)
-
-        claimed_by = ticket.get("claimed_by")
-        user_id = str(interaction.user.id)
-        if claimed_by is not None:
-            if claimed_by != user_id and not is_admin:
-                return await interaction.response.send_message(
-                    f"This ticket is claimed by <@{claimed_by}>. Only they (or an admin) can close it.",
-                    ephemeral=True
-                )
-
-        await interaction.response.defer(ephemeral=True)
-        await interaction.followup.send("Closing ticket in 3 seconds...", ephemeral=True)
-
-        transcript_html = None
-        try:
-            transcript_html = await chat_exporter.export(
-                channel=channel,
-                limit=500,
-                tz_info="Europe/London",
-                bot=interaction.client,
-            )
-        except Exception as e:
-            try:
-                await interaction.followup.send(f"Transcript error: {e}", ephemeral=True)
-            except Exception:
-                pass
-
-        if transcript_html and SAVE_TRANSCRIPTS:
-            try:
-                save_transcript_to_disk(channel.name, transcript_html)
-            except Exception:
-                pass
-
-        db = load_tickets_db()
-        ticket = db["tickets_by_channel"].get(channel_id) or {}
-        ticket_type = ticket.get("type", "Unknown")
+            return await interaction.response.send_message("Ticket data not found.", ephemeral=True)
 
-        claimed_by_text = f"<@{ticket.get('claimed_by')}>" if ticket.get("claimed_by") else "Not claimed"
+        handler = TICKET_ACTIONS.get((interaction.data or {}).get("custom_id"))
+        if handler:
+            await handler(interaction, ctx, ticket)
 
-        log_ch = guild.get_channel(LOG_CHANNEL_ID)
-        close_log = build_close_log(
-            channel=channel,
-            opener_id=self.opener_id,
-            claimed_by_text=claimed_by_text,
-            closed_by=interaction.user,
-            transcript_ok=bool(transcript_html),
-            ticket_type=ticket_type
-        )
-
-        if isinstance(log_ch, discord.TextChannel):
-            if transcript_html:
-                buf = io.BytesIO(transcript_html.encode("utf-8"))
-                buf.seek(0)
-                log_file = discord.File(buf, filename=f"transcript-{channel.name}.html")
-                await log_ch.send(embed=close_log, file=log_file)
-            else:
-                await log_ch.send(embed=close_log)
+    @discord.ui.button(label="Claim Ticket", style=discord.ButtonStyle.blurple, emoji="✅", custom_id="ticket:claim")
+    async def claim_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.dispatch(interaction)
 
-        if transcript_html:
-            try:
-                opener_member = guild.get_member(self.opener_id)
-                opener_user = opener_member if opener_member else await interaction.client.fetch_user(self.opener_id)
-
-                buf = io.BytesIO(transcript_html.encode("utf-8"))
-                buf.seek(0)
-                dm_file = discord.File(buf, filename=f"transcript-{channel.name}.html")
-
-                send_embed = discord.Embed(
-                    title="🎫 Ticket Closed",
-                    description=(
-                        f"Your support ticket **{channel.name}** has been successfully closed.\n\n"
-                        "📄 **Transcript**\n"
-                        "A full transcript of the conversation is attached for your records."
-                    ),
-                    color=0x2b2d31
-                )
-                send_embed.timestamp = discord.utils.utcnow()
-                if guild.icon:
-                    send_embed.set_thumbnail(url=guild.icon.url)
-                send_embed.set_footer(text="Thank you for contacting support")
-
-                await opener_user.send(embed=send_embed, file=dm_file)
-
-            except discord.Forbidden:
-                if isinstance(log_ch, discord.TextChannel):
-                    await log_ch.send(f"⚠️ Could not DM transcript to <@{self.opener_id}> (DMs closed).")
-            except Exception as e:
-                if isinstance(log_ch, discord.TextChannel):
-                    await log_ch.send(f"⚠️ Failed to DM transcript to <@{self.opener_id}>: {e}")
-
-        db = load_tickets_db()
-        db.get("open_tickets_by_user", {}).pop(str(self.opener_id), None)
-        db.get("tickets_by_channel", {}).pop(str(channel.id), None)
-        save_tickets_db(db)
-
-        await asyncio.sleep(3)
-        await channel.delete(reason=f"Ticket closed by {interaction.user} ({interaction.user.id})")
+    @discord.ui.button(label="Close Ticket", style=discord.ButtonStyle.red, emoji="🔒", custom_id="ticket:close")
+    async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.dispatch(interaction)
 
 @bot.tree.command(name="panel", description="Post the ticket panel (staff only).")
-@app_commands.guilds(discord.Object(id=GUILD_ID))
+@app_commands.guild_only()
 async def panel(interaction: discord.Interaction):
     if not interaction.guild or not isinstance(interaction.user, discord.Member):
         return await interaction.response.send_message("This only works in a server.", ephemeral=True)
@@ -397,18 +990,19 @@ async def panel(interaction: discord.Interaction):
     if not interaction.user.guild_permissions.manage_channels:
         return await interaction.response.send_message("You don’t have permission to use this.", ephemeral=True)
 
-    types_list = "\n".join(f"• {t}" for t in TICKET_TYPES)
+    ticket_types = guilds.config(interaction.guild.id).ticket_types
+    types_list = "\n".join(f"• {t}" for t in ticket_types)
     embed = discord.Embed(
         title="Support Tickets",
         description=f"Select a ticket type from the dropdown below:\n\n{types_list}",
         color=0x2b2d31
     )
 
-    await interaction.channel.send(embed=embed, view=TicketPanelView())
+    await interaction.channel.send(embed=embed, view=TicketPanelView(ticket_types))
     await interaction.response.send_message("✅ Panel posted.", ephemeral=True)
 
 @bot.tree.command(name="forceclose", description="Force close a ticket (works after restarts).")
-@app_commands.guilds(discord.Object(id=GUILD_ID))
+@app_commands.guild_only()
 @app_commands.describe(channel="Ticket channel to force close (leave empty to use current channel)")
 async def forceclose(interaction: discord.Interaction, channel: discord.TextChannel | None = None):
     if not interaction.guild or not isinstance(interaction.user, discord.Member):
@@ -417,7 +1011,8 @@ async def forceclose(interaction: discord.Interaction, channel: discord.TextChan
     if not interaction.user.guild_permissions.manage_channels:
         return await interaction.response.send_message("You don’t have permission to use this.", ephemeral=True)
 
-    await interaction.response.defer(ephemeral=True)
+    started = time.perf_counter()
+    await latency.timed("forceclose.defer", interaction.response.defer(ephemeral=True))
 
     guild = interaction.guild
     target_channel = channel or interaction.channel
@@ -426,121 +1021,347 @@ async def forceclose(interaction: discord.Interaction, channel: discord.TextChan
 
     channel_id = str(target_channel.id)
 
-    db = load_tickets_db()
-    ticket = db.get("tickets_by_channel", {}).get(channel_id)
+    ctx = await guilds.get(guild.id)
+    ticket = await latency.timed("forceclose.lookup", ctx.store.get_ticket(channel_id))
     if not ticket:
         return await interaction.followup.send("That channel is not in my tickets database.", ephemeral=True)
 
-    opener_id = int(ticket.get("opener_id"))
-    ticket_type = ticket.get("type", "Unknown")
-    claimed_by_id = ticket.get("claimed_by")
-    claimed_by_text = f"<@{claimed_by_id}>" if claimed_by_id else "Not claimed"
+    closing = await request_close(
+        guild,
+        target_channel,
+        ticket,
+        closed_by=interaction.user,
+        forced=True,
+        reason=f"Force closed by {interaction.user} ({interaction.user.id})",
+        span="forceclose",
+    )
+    if closing is None:
+        return await interaction.followup.send("That ticket is already being closed.", ephemeral=True)
+    await latency.timed("forceclose.followup", interaction.followup.send(f"✅ Force closing {target_channel.mention} in {CLOSE_DELAY_SECONDS} seconds…", ephemeral=True))
+    latency.observe("forceclose.total", time.perf_counter() - started)
+
+def ticket_last_activity(ticket: dict) -> float:
+    return inactivity.last_activity(ticket["channel_id"]) or ticket.get("last_activity") or ticket.get("opened_at") or 0
+
+async def close_matching_ticket(guild: discord.Guild, ctx, ticket: dict, closed_by: discord.abc.User, limiter: asyncio.Semaphore) -> str:
+    label = f"#{ticket.get('ticket_number', '?')}"
+    async with limiter:
+        channel = guild.get_channel(int(ticket["channel_id"]))
+        if not isinstance(channel, discord.TextChannel):
+            # nothing left to export or delete; just drop the record
+            if await drop_ticket(ctx, ticket, closed_by, forced=True):
+                await live_logs.discard(ticket["channel_id"])
+            return f"🗑 {label} channel was already gone, record removed"
+        try:
+            closing = await request_close(
+                guild,
+                channel,
+                ticket,
+                closed_by=closed_by,
+                forced=True,
+                reason=f"Bulk closed by {closed_by} ({closed_by.id})",
+                span="bulkclose",
+            )
+            if closing is None:
+                return f"⏭ {label} {channel.name} was already closing"
+            # waiting for the capture keeps at most `limiter` closes hitting the API at once
+            transcript_ok = await closing
+        except Exception as e:
+            return f"❌ {label} {channel.name}: {e}"
+    return f"✅ {label} {channel.name}" + ("" if transcript_ok else " (no transcript)")
+
+@bot.tree.command(name="bulkclose", description="Close every ticket that matches a filter (admin only).")
+@app_commands.guild_only()
+@app_commands.describe(
+    ticket_type="Only tickets of this type",
+    status="Only unclaimed or only claimed tickets",
+    claimer="Only tickets claimed by this staff member",
+    inactive_hours="Only tickets with no messages for at least this many hours",
+    confirm="Close them; without this the matching tickets are only listed",
+)
+@app_commands.choices(status=[
+    app_commands.Choice(name="Unclaimed", value="open"),
+    app_commands.Choice(name="Claimed", value="claimed"),
+])
+async def bulkclose(
+    interaction: discord.Interaction,
+    ticket_type: str | None = None,
+    status: app_commands.Choice[str] | None = None,
+    claimer: discord.User | None = None,
+    inactive_hours: app_commands.Range[float, 0] | None = None,
+    confirm: bool = False,
+):
+    if not interaction.guild or not isinstance(interaction.user, discord.Member):
+        return await interaction.response.send_message("This only works in a server.", ephemeral=True)
+
+    if not interaction.user.guild_permissions.manage_channels:
+        return await interaction.response.send_message("You don’t have permission to use this.", ephemeral=True)
 
-    transcript_html = None
-    try:
-        transcript_html = await chat_exporter.export(
-            channel=target_channel,
-            limit=500,
-            tz_info="Europe/London",
-            bot=interaction.client,
+    await interaction.response.defer(ephemeral=True)
+
+    guild = interaction.guild
+    ctx = await guilds.get(guild.id)
+    tickets = await ctx.store.find_tickets(
+        status=status.value if status else ("open", "claimed"),
+        claimed_by=claimer.id if claimer else None,
+        type=ticket_type or None,
+    )
+    if inactive_hours:
+        cutoff = time.time() - inactive_hours * 3600
+        tickets = [t for t in tickets if ticket_last_activity(t) <= cutoff]
+
+    if not tickets:
+        return await interaction.followup.send("No open tickets match that filter.", ephemeral=True)
+
+    if not confirm:
+        lines = [
+            f"#{t.get('ticket_number', '?')} <#{t['channel_id']}> • <@{t.get('opener_id')}> • {t.get('type') or 'Unknown'}"
+            f" • last activity <t:{int(ticket_last_activity(t))}:R>"
+            for t in tickets
+        ]
+        embed = discord.Embed(
+            title=f"🧹 {len(tickets)} matching tickets",
+            description=fit_lines(lines),
+            color=0x2b2d31
         )
-    except Exception as e:
-        await interaction.followup.send(f"Transcript error: {e}", ephemeral=True)
+        embed.set_footer(text="Run the command again with confirm: True to close them")
+        return await interaction.followup.send(embed=embed, ephemeral=True)
+
+    progress = await interaction.followup.send(f"Closing 0/{len(tickets)} tickets…", ephemeral=True, wait=True)
+    limiter = asyncio.Semaphore(BULK_CLOSE_CONCURRENCY)
+    pending = [
+        asyncio.create_task(close_matching_ticket(guild, ctx, t, interaction.user, limiter))
+        for t in tickets
+    ]
+
+    outcomes = []
+    last_update = time.monotonic()
+    for finished in asyncio.as_completed(pending):
+        outcomes.append(await finished)
+        if time.monotonic() - last_update >= 2 and len(outcomes) < len(pending):
+            last_update = time.monotonic()
+            try:
+                await progress.edit(content=f"Closing {len(outcomes)}/{len(tickets)} tickets…")
+            except discord.HTTPException:
+                pass
 
-    if transcript_html and SAVE_TRANSCRIPTS:
-        try:
-            save_transcript_to_disk(target_channel.name, transcript_html)
-        except Exception:
-            pass
-
-    log_ch = guild.get_channel(LOG_CHANNEL_ID)
-    close_log = build_close_log(
-        channel=target_channel,
-        opener_id=opener_id,
-        claimed_by_text=claimed_by_text,
-        closed_by=interaction.user,
-        transcript_ok=bool(transcript_html),
-        ticket_type=ticket_type
+    closed = sum(1 for o in outcomes if o.startswith("✅"))
+    embed = discord.Embed(
+        title=f"🧹 Bulk close: {closed}/{len(tickets)} closed",
+        description=fit_lines(sorted(outcomes)),
+        color=0x2b2d31
     )
+    await progress.edit(content=None, embed=embed)
 
+    log_ch = guild.get_channel(ctx.config.log_channel_id)
     if isinstance(log_ch, discord.TextChannel):
-        if transcript_html:
-            buf = io.BytesIO(transcript_html.encode("utf-8"))
-            buf.seek(0)
-            log_file = discord.File(buf, filename=f"transcript-{target_channel.name}.html")
-            await log_ch.send(embed=close_log, file=log_file)
-        else:
-            await log_ch.send(embed=close_log)
+        log_sink.post(log_ch.id, build_warning_log(f"🧹 {interaction.user.mention} bulk closed {closed} tickets."), LOG_WARNING)
 
-    if transcript_html:
-        try:
-            opener_member = guild.get_member(opener_id)
-            opener_user = opener_member if opener_member else await interaction.client.fetch_user(opener_id)
-
-            buf = io.BytesIO(transcript_html.encode("utf-8"))
-            buf.seek(0)
-            dm_file = discord.File(buf, filename=f"transcript-{target_channel.name}.html")
-
-            send_embed = discord.Embed(
-                title="🎫 Ticket Closed",
-                description=(
-                    f"Your support ticket **{target_channel.name}** has been force-closed by staff.\n\n"
-                    "📄 **Transcript**\n"
-                    "A full transcript of the conversation is attached for your records."
-                ),
-                color=0x2b2d31
-            )
-            send_embed.timestamp = discord.utils.utcnow()
-            if guild.icon:
-                send_embed.set_thumbnail(url=guild.icon.url)
-            send_embed.set_footer(text="Thank you for contacting support")
+@bulkclose.autocomplete("ticket_type")
+async def bulkclose_type_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    return await ticket_type_autocomplete(interaction, current)
+
+@bot.tree.command(name="duty", description="Go on or off duty for automatic ticket assignment (staff only).")
+@app_commands.guild_only()
+@app_commands.describe(on="On duty (leave empty to toggle)")
+async def duty(interaction: discord.Interaction, on: bool | None = None):
+    if not interaction.guild or not isinstance(interaction.user, discord.Member):
+        return await interaction.response.send_message("This only works in a server.", ephemeral=True)
 
-            await opener_user.send(embed=send_embed, file=dm_file)
+    if not is_staff(interaction.user):
+        return await interaction.response.send_message("Only support staff can go on duty.", ephemeral=True)
+
+    ctx = await guilds.get(interaction.guild.id)
+    if not ctx.assigner:
+        return await interaction.response.send_message("Automatic assignment is not enabled on this server.", ephemeral=True)
+
+    staff_id = interaction.user.id
+    if on is None:
+        on = not ctx.assigner.is_on_duty(staff_id)
+
+    if on:
+        claimed = await ctx.store.find_tickets(status=("open", "claimed"), claimed_by=staff_id)
+        ctx.assigner.on_duty(staff_id, len(claimed))
+        message = f"🟢 You are on duty and will be assigned new tickets. You currently hold {len(claimed)} open tickets."
+    else:
+        ctx.assigner.off_duty(staff_id)
+        message = "⚪ You are off duty and won't be assigned new tickets."
+    await ctx.assigner.save()
+    await interaction.response.send_message(message, ephemeral=True)
+
+@bot.tree.command(name="transcript", description="Fetch the archived transcript of a closed ticket (staff only).")
+@app_commands.guild_only()
+@app_commands.describe(number="Ticket number")
+async def transcript(interaction: discord.Interaction, number: int):
+    if not interaction.guild or not isinstance(interaction.user, discord.Member):
+        return await interaction.response.send_message("This only works in a server.", ephemeral=True)
 
-        except discord.Forbidden:
-            if isinstance(log_ch, discord.TextChannel):
-                await log_ch.send(f"⚠️ Could not DM transcript to <@{opener_id}> (DMs closed).")
-        except Exception as e:
-            if isinstance(log_ch, discord.TextChannel):
-                await log_ch.send(f"⚠️ Failed to DM transcript to <@{opener_id}>: {e}")
+    if not (is_staff(interaction.user) or interaction.user.guild_permissions.manage_channels):
+        return await interaction.response.send_message("You don’t have permission to use this.", ephemeral=True)
 
-    db = load_tickets_db()
-    db.get("open_tickets_by_user", {}).pop(str(opener_id), None)
-    db.get("tickets_by_channel", {}).pop(channel_id, None)
-    save_tickets_db(db)
+    await interaction.response.defer(ephemeral=True)
 
-    await interaction.followup.send(f"✅ Force closing {target_channel.mention} in 3 seconds…", ephemeral=True)
-    await asyncio.sleep(3)
-    await target_channel.delete(reason=f"Force closed by {interaction.user} ({interaction.user.id})")
+    entry = await archive.find(number, guild_id=interaction.guild.id)
+    if not entry:
+        return await interaction.followup.send(f"No archived transcript for ticket #{number}.", ephemeral=True)
 
-@bot.tree.command(name="ticketstats", description="View ticket statistics.")
-@app_commands.guilds(discord.Object(id=GUILD_ID))
-async def ticketstats(interaction: discord.Interaction):
-    if not interaction.guild:
+    fp = await asyncio.to_thread(archive.open_blob, entry)
+    try:
+        await interaction.followup.send(
+            f"📄 Transcript for **{entry['channel_name']}** (closed <t:{int(entry['closed_at'])}:f>)",
+            file=discord.File(fp, filename=f"transcript-{entry['channel_name']}.html"),
+            ephemeral=True,
+        )
+    finally:
+        fp.close()
+
+def parse_day(value: str | None) -> float | None:
+    if not value:
+        return None
+    return datetime.strptime(value.strip(), "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+@bot.tree.command(name="ticketsearch", description="Search archived tickets and transcripts (staff only).")
+@app_commands.guild_only()
+@app_commands.describe(
+    query="Words to look for in the transcript",
+    opener="Only tickets opened by this user",
+    claimer="Only tickets claimed by this staff member",
+    ticket_type="Only tickets of this type",
+    after="Closed on or after this day (YYYY-MM-DD)",
+    before="Closed before this day (YYYY-MM-DD)",
+)
+async def ticketsearch(
+    interaction: discord.Interaction,
+    query: str | None = None,
+    opener: discord.User | None = None,
+    claimer: discord.User | None = None,
+    ticket_type: str | None = None,
+    after: str | None = None,
+    before: str | None = None,
+):
+    if not interaction.guild or not isinstance(interaction.user, discord.Member):
         return await interaction.response.send_message("This only works in a server.", ephemeral=True)
 
-    db = load_tickets_db()
+    if not (is_staff(interaction.user) or interaction.user.guild_permissions.manage_channels):
+        return await interaction.response.send_message("You don’t have permission to use this.", ephemeral=True)
+
+    try:
+        closed_after = parse_day(after)
+        closed_before = parse_day(before)
+    except ValueError:
+        return await interaction.response.send_message("Dates must look like 2024-01-31.", ephemeral=True)
+
+    await interaction.response.defer(ephemeral=True)
 
-    total_created = int(db.get("last_ticket_number", 0))
-    tickets = db.get("tickets_by_channel", {})
+    results = await archive.search(
+        query or "",
+        guild_id=interaction.guild.id,
+        opener_id=opener.id if opener else None,
+        claimed_by=claimer.id if claimer else None,
+        type=ticket_type or None,
+        closed_after=closed_after,
+        closed_before=closed_before,
+        limit=10,
+    )
+    if not results:
+        if query and not SAVE_TRANSCRIPTS:
+            return await interaction.followup.send("No matching tickets. Message text is only searchable when transcripts are saved; try the opener, claimer, type or date filters.", ephemeral=True)
+        return await interaction.followup.send("No matching tickets.", ephemeral=True)
+
+    lines = []
+    for r in results:
+        claimed = f" • claimed by <@{r['claimed_by']}>" if r.get("claimed_by") else ""
+        lines.append(
+            f"**#{r['ticket_number']}** {r['channel_name']} • <@{r['opener_id']}> • {r.get('type') or 'Unknown'}"
+            f"{claimed} • closed <t:{int(r['closed_at'])}:d>"
+        )
+
+    embed = discord.Embed(
+        title="🔎 Ticket Search",
+        description="\n".join(lines),
+        color=0x2b2d31
+    )
+    embed.set_footer(text="Use /transcript <number> to fetch a transcript")
+    await interaction.followup.send(embed=embed, ephemeral=True)
 
-    open_count = 0
-    claimed_count = 0
+@ticketsearch.autocomplete("ticket_type")
+async def ticket_type_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    if not interaction.guild:
+        return []
+    current = current.lower()
+    return [
+        app_commands.Choice(name=t, value=t)
+        for t in guilds.config(interaction.guild.id).ticket_types
+        if current in t.lower()
+    ][:25]
+
+def format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "n/a"
+    if seconds == float("inf"):
+        return "> 7d"
+    if seconds < 3600:
+        return f"≤ {int(seconds // 60)}m"
+    if seconds < 86400:
+        return f"≤ {int(seconds // 3600)}h"
+    return f"≤ {int(seconds // 86400)}d"
+
+PERF_AREAS = ("create", "claim", "close", "forceclose", "transcript", "store", "rest")
+
+def format_perf_line(name: str) -> str:
+    p = latency.percentiles(name)
+    return f"`{name}` — p50 {p[0.5] * 1000:.0f}ms • p95 {p[0.95] * 1000:.0f}ms • p99 {p[0.99] * 1000:.0f}ms ({latency.count(name)})"
+
+@bot.tree.command(name="ticketperf", description="Show recent ticket latency by stage (staff only).")
+@app_commands.guild_only()
+@app_commands.describe(area="Only show one part of the bot")
+@app_commands.choices(area=[app_commands.Choice(name=a, value=a) for a in PERF_AREAS])
+async def ticketperf(interaction: discord.Interaction, area: app_commands.Choice[str] | None = None):
+    if not interaction.guild or not isinstance(interaction.user, discord.Member):
+        return await interaction.response.send_message("This only works in a server.", ephemeral=True)
 
-    staff_claims = {}
+    if not (is_staff(interaction.user) or interaction.user.guild_permissions.manage_channels):
+        return await interaction.response.send_message("You don’t have permission to use this.", ephemeral=True)
 
-    for ticket in tickets.values():
-        status = ticket.get("status")
-        claimed_by = ticket.get("claimed_by")
+    # the stage spans first, then the per-call store and REST timings
+    prefixes = [f"{area.value}."] if area else [f"{a}." for a in PERF_AREAS]
+    lines = [format_perf_line(name) for prefix in prefixes for name in latency.names(prefix)]
 
-        if status in ("open", "claimed"):
-            open_count += 1
+    embed = discord.Embed(
+        title="⏱️ Ticket Latency",
+        description=fit_lines(lines) if lines else "Nothing recorded since the last restart.",
+        color=0x2b2d31
+    )
+    rest_calls = counters.total("rest_requests_total")
+    embed.add_field(
+        name="Store",
+        value=f"{counters.total('store_operations_total', kind='read'):.0f} reads • {counters.total('store_operations_total', kind='write'):.0f} writes",
+        inline=True
+    )
+    embed.add_field(
+        name="REST",
+        value=f"{rest_calls:.0f} calls • {rest_calls - counters.total('rest_requests_total', status='ok'):.0f} failed",
+        inline=True
+    )
+    embed.add_field(
+        name="Rate Limits (429s)",
+        value=f"{counters.total('rest_ratelimited_total'):.0f} hits • {counters.total('rest_ratelimit_wait_seconds_total'):.1f}s waited",
+        inline=True
+    )
+    if METRICS_PORT:
+        embed.set_footer(text=f"Full metrics: http://127.0.0.1:{METRICS_PORT}/metrics")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        if claimed_by:
-            claimed_count += 1
-            staff_claims[claimed_by] = staff_claims.get(claimed_by, 0) + 1
+@bot.tree.command(name="ticketstats", description="View ticket statistics.")
+@app_commands.guild_only()
+async def ticketstats(interaction: discord.Interaction):
+    if not interaction.guild:
+        return await interaction.response.send_message("This only works in a server.", ephemeral=True)
 
-    closed_count = total_created - open_count
+    ctx = await guilds.get(interaction.guild.id)
+    stats = ctx.stats
+    total_created = await ctx.store.get_last_ticket_number()
+    totals = stats.state["totals"]
 
     embed = discord.Embed(
         title="📊 Ticket Statistics",
@@ -548,16 +1369,41 @@ async def ticketstats(interaction: discord.Interaction):
     )
 
     embed.add_field(name="Total Tickets Created", value=str(total_created), inline=True)
-    embed.add_field(name="Currently Open", value=str(open_count), inline=True)
-    embed.add_field(name="Currently Claimed", value=str(claimed_count), inline=True)
-    embed.add_field(name="Closed Tickets", value=str(closed_count), inline=True)
+    embed.add_field(name="Currently Open", value=str(stats.open_count()), inline=True)
+    embed.add_field(name="Currently Claimed", value=str(stats.claimed_count()), inline=True)
+    embed.add_field(name="Closed Tickets", value=str(totals["closed"]), inline=True)
+
+    windows = ""
+    for name in ("24h", "7d", "30d"):
+        w = stats.window(name)
+        windows += f"**{name}** — {w['opened']} opened, {w['closed']} closed\n"
+    embed.add_field(name="Recent Activity", value=windows, inline=False)
+
+    first_response = stats.state["first_response"]
+    resolution = stats.state["resolution"]
+    embed.add_field(
+        name="First Response",
+        value=f"p50 {format_duration(quantile(first_response, 0.5))} • p90 {format_duration(quantile(first_response, 0.9))}",
+        inline=True
+    )
+    embed.add_field(
+        name="Resolution Time",
+        value=f"p50 {format_duration(quantile(resolution, 0.5))} • p90 {format_duration(quantile(resolution, 0.9))}",
+        inline=True
+    )
 
-    if staff_claims:
-        leaderboard = ""
-        sorted_staff = sorted(staff_claims.items(), key=lambda x: x[1], reverse=True)
+    if stats.state["per_type"]:
+        by_type = "\n".join(
+            f"{t} — {c['opened']} opened, {c['closed']} closed"
+            for t, c in sorted(stats.state["per_type"].items())
+        )
+        embed.add_field(name="By Type", value=by_type, inline=False)
 
-        for staff_id, count in sorted_staff[:5]:
-            leaderboard += f"<@{staff_id}> — {count}\n"
+    top = stats.top_staff(5)
+    if top:
+        leaderboard = ""
+        for staff_id, counts in top:
+            leaderboard += f"<@{staff_id}> — {counts['claims']} claimed, {counts['closes']} closed\n"
 
         embed.add_field(
             name="Top Staff (by Claims)",
@@ -569,6 +1415,23 @@ async def ticketstats(interaction: discord.Interaction):
 
     await interaction.response.send_message(embed=embed)
 
+@bot.tree.command(name="rebuildstats", description="Recompute ticket statistics from the event log (admin only).")
+@app_commands.guild_only()
+async def rebuildstats(interaction: discord.Interaction):
+    if not interaction.guild or not isinstance(interaction.user, discord.Member):
+        return await interaction.response.send_message("This only works in a server.", ephemeral=True)
+
+    if not interaction.user.guild_permissions.manage_channels:
+        return await interaction.response.send_message("You don’t have permission to use this.", ephemeral=True)
+
+    await interaction.response.defer(ephemeral=True)
+    ctx = await guilds.get(interaction.guild.id)
+    state = await ctx.stats.rebuild()
+    await interaction.followup.send(
+        f"✅ Statistics rebuilt from {state['totals']['opened']} opens and {state['totals']['closed']} closes.",
+        ephemeral=True
+    )
 
-bot.run(TOKEN)
 
+if __name__ == "__main__":
+    bot.run(TOKEN)
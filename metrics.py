@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import logging
+import time
+
+from collections import deque
+
+
+class LatencyRecorder:
+    # Keeps the most recent `window` samples per stage, which is enough for stable
+    # p50/p95/p99 figures without unbounded memory. Counts and sums are kept for the
+    # whole run, as Prometheus summaries expect.
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self.samples: dict[str, deque] = {}
+        self.totals: dict[str, list[float]] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        bucket = self.samples.get(name)
+        if bucket is None:
+            bucket = self.samples[name] = deque(maxlen=self.window)
+            self.totals[name] = [0, 0.0]
+        bucket.append(seconds)
+        total = self.totals[name]
+        total[0] += 1
+        total[1] += seconds
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    async def timed(self, name: str, aw):
+        with self.span(name):
+            return await aw
+
+    def percentiles(self, name: str, qs=(0.5, 0.95, 0.99)) -> dict[float, float]:
+        values = sorted(self.samples.get(name, ()))
+        if not values:
+            return {}
+        last = len(values) - 1
+        return {q: values[min(last, int(round(q * last)))] for q in qs}
+
+    def names(self, prefix: str = "") -> list[str]:
+        return sorted(n for n in self.samples if n.startswith(prefix))
+
+    def count(self, name: str) -> int:
+        return len(self.samples.get(name, ()))
+
+
+class CounterSet:
+    # Monotonic counters keyed by name and label set.
+
+    def __init__(self):
+        self.values: dict[tuple[str, tuple], float] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self, name: str, **labels) -> float:
+        want = {(k, str(v)) for k, v in labels.items()}
+        return sum(v for (n, ls), v in self.values.items() if n == name and want <= set(ls))
+
+
+class InstrumentedStore:
+    # Wraps a TicketStore or SqliteTicketStore so every query and mutation the bot makes
+    # is counted and timed as `store.<method>`; everything else passes straight through.
+    # Calls a store makes to itself (claim_ticket -> update_ticket) are not seen here.
+
+    READS = frozenset({"get_ticket", "get_open_channel_id", "open_tickets", "find_tickets", "get_last_ticket_number"})
+    WRITES = frozenset({"add_ticket", "update_ticket", "claim_ticket", "remove_ticket", "reserve_ticket_numbers"})
+
+    def __init__(self, store, latency: LatencyRecorder, counters: CounterSet):
+        self.inner = store
+        self._latency = latency
+        self._counters = counters
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.inner, name)
+        kind = "read" if name in self.READS else "write" if name in self.WRITES else None
+        if kind is None:
+            return attr
+
+        async def call(*args, **kwargs):
+            self._counters.inc("store_operations_total", op=name, kind=kind)
+            with self._latency.span(f"store.{name}"):
+                return await attr(*args, **kwargs)
+
+        return call
+
+
+def instrument_http(http, latency: LatencyRecorder, counters: CounterSet) -> None:
+    # Counts and times every bot REST call by route template ("POST /channels/{channel_id}/messages").
+    # Time spent waiting on rate limits inside discord.py is part of the call.
+    request = http.request
+    if getattr(request, "instrumented", False):
+        return
+
+    async def timed_request(route, **kwargs):
+        name = f"{route.method} {route.path}"
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            return await request(route, **kwargs)
+        except Exception as e:
+            status = str(getattr(e, "status", None) or type(e).__name__)
+            raise
+        finally:
+            latency.observe(f"rest.{name}", time.perf_counter() - start)
+            counters.inc("rest_requests_total", route=name, status=status)
+
+    timed_request.instrumented = True
+    http.request = timed_request
+
+
+class RateLimitLogHandler(logging.Handler):
+    # discord.py waits out 429s itself and only reports them through its loggers
+    # ("... Retrying in %.2f seconds."), so the waits are counted from those records.
+    # A global 429 logs the route line and then "Global rate limit has been hit...";
+    # only the first is counted. Pre-emptive waits on an exhausted bucket are logged at
+    # DEBUG and never seen here, so these counters cover 429 responses only.
+
+    LOGGERS = ("discord.http", "discord.webhook.async_")
+
+    def __init__(self, counters: CounterSet):
+        super().__init__(logging.WARNING)
+        self.counters = counters
+
+    def install(self) -> None:
+        for name in self.LOGGERS:
+            logger = logging.getLogger(name)
+            if self not in logger.handlers:
+                logger.addHandler(self)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        msg = str(record.msg)
+        if "rate limit" not in msg or "Retrying in" not in msg or not record.args or msg.startswith("Global"):
+            return
+        try:
+            wait = float(record.args[-1])
+        except (TypeError, ValueError):
+            return
+        scope = "webhook" if record.name.startswith("discord.webhook") else "route"
+        self.counters.inc("rest_ratelimited_total", scope=scope)
+        self.counters.inc("rest_ratelimit_wait_seconds_total", wait, scope=scope)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def render_prometheus(latency: LatencyRecorder, counters: CounterSet, gauges: dict | None = None, prefix: str = "ticketbot") -> str:
+    # Prometheus text exposition format 0.0.4
+    lines = [f"# TYPE {prefix}_span_seconds summary"]
+    for name in latency.names():
+        for q, v in latency.percentiles(name).items():
+            lines.append(f"{prefix}_span_seconds{_labels([('span', name), ('quantile', q)])} {_number(v)}")
+        count, total = latency.totals[name]
+        lines.append(f"{prefix}_span_seconds_sum{_labels([('span', name)])} {_number(total)}")
+        lines.append(f"{prefix}_span_seconds_count{_labels([('span', name)])} {count}")
+
+    by_name: dict[str, list] = {}
+    for (name, labels), value in sorted(counters.values.items()):
+        by_name.setdefault(name, []).append((labels, value))
+    for name, series in by_name.items():
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        lines.extend(f"{prefix}_{name}{_labels(labels)} {_number(value)}" for labels, value in series)
+
+    for name, read in (gauges or {}).items():
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {_number(read())}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    # Minimal HTTP endpoint for Prometheus scrapes: GET /metrics, bound to localhost only.
+
+    def __init__(self, render, port: int, host: str = "127.0.0.1"):
+        self.render = render
+        self.port = port
+        self.host = host
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        if self._server or not self.port:
+            return
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?", 1)[0] == "/metrics":
+                status, body = "200 OK", self.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,35 @@
+import re
+
+TICKET_CHANNEL_RE = re.compile(r"^ticket-(\d{4,})(?:-(.+))?$")
+
+
+def diff_tickets(open_tickets: list[dict], channels, skip_ids=()) -> tuple[list[dict], list]:
+    # One pass over each side: tickets whose channel is gone, and ticket-XXXX channels
+    # the store does not know about. `skip_ids` are channels that are legitimately in
+    # between (being created, or closed and waiting for deletion).
+    live = {str(c.id): c for c in channels}
+    known = {str(t["channel_id"]) for t in open_tickets}
+    skip = {str(i) for i in skip_ids}
+
+    orphans = [t for t in open_tickets if str(t["channel_id"]) not in live and str(t["channel_id"]) not in skip]
+    strays = [
+        c for cid, c in live.items()
+        if cid not in known and cid not in skip and TICKET_CHANNEL_RE.match(c.name)
+    ]
+    return orphans, strays
+
+def parse_ticket_channel(name: str, ticket_types: list[str], slug) -> tuple[int, str] | None:
+    m = TICKET_CHANNEL_RE.match(name)
+    if not m:
+        return None
+    by_slug = {slug(t): t for t in ticket_types}
+    return int(m.group(1)), by_slug.get(m.group(2) or "", "Unknown")
+
+def guess_opener(channel, exclude_ids, role_type) -> int | None:
+    # ticket channels give exactly one member an explicit allow overwrite: the opener
+    for target, overwrite in channel.overwrites.items():
+        if isinstance(target, role_type) or target.id in exclude_ids:
+            continue
+        if overwrite.view_channel:
+            return target.id
+    return None
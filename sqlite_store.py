@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ticket_store import TicketStore
+
+COLUMNS = ("channel_id", "ticket_number", "opener_id", "type", "claimed_by", "status", "opened_at", "closed_at")
+OPEN_STATUSES = ("open", "claimed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    channel_id    TEXT PRIMARY KEY,
+    ticket_number INTEGER,
+    opener_id     TEXT,
+    type          TEXT,
+    claimed_by    TEXT,
+    status        TEXT NOT NULL DEFAULT 'open',
+    opened_at     REAL,
+    closed_at     REAL,
+    extra         TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_opener_status ON tickets (opener_id, status);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status);
+CREATE INDEX IF NOT EXISTS idx_tickets_claimed_by ON tickets (claimed_by);
+CREATE INDEX IF NOT EXISTS idx_tickets_type ON tickets (type);
+CREATE INDEX IF NOT EXISTS idx_tickets_opened_at ON tickets (opened_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_closed_at ON tickets (closed_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def row_to_ticket(row) -> dict | None:
+    if row is None:
+        return None
+    ticket = json.loads(row[-1] or "{}")
+    ticket.update({k: v for k, v in zip(COLUMNS, row) if v is not None or k == "claimed_by"})
+    return ticket
+
+def ticket_to_row(ticket: dict) -> tuple:
+    extra = {k: v for k, v in ticket.items() if k not in COLUMNS}
+    values = []
+    for k in COLUMNS:
+        v = ticket.get(k)
+        if k in ("channel_id", "opener_id", "claimed_by") and v is not None:
+            v = str(v)
+        values.append(v)
+    values.append(json.dumps(extra, separators=(",", ":")))
+    return tuple(values)
+
+def _json_store_exists(json_path: str) -> bool:
+    return os.path.exists(json_path) or os.path.exists(f"{json_path}.journal")
+
+
+class SqliteTicketStore:
+    # Same interface as TicketStore, backed by an indexed SQLite table in WAL mode.
+    # Every query runs on one dedicated thread that owns the connection, so the event
+    # loop never waits on disk. Closed tickets stay in the table with status "closed".
+    # The thread may be shared between stores (`executor`, which must have one worker).
+
+    def __init__(self, path: str = "tickets.db", import_from: str | None = None, executor: ThreadPoolExecutor | None = None):
+        self.path = path
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="ticket-sqlite")
+        self._conn: sqlite3.Connection | None = None
+        self._executor.submit(self._open).result()
+        if import_from and _json_store_exists(import_from):
+            self._executor.submit(self._import_json_once, import_from).result()
+
+    # ---------- connection / thread ----------
+
+    def _open(self) -> None:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+        self._conn = conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _meta_get(self, key: str, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _meta_set(self, key: str, value) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+
+    def _put(self, ticket: dict) -> None:
+        placeholders = ", ".join("?" for _ in range(len(COLUMNS) + 1))
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO tickets ({', '.join(COLUMNS)}, extra) VALUES ({placeholders})",
+            ticket_to_row(ticket),
+        )
+
+    def _get(self, channel_id: str) -> dict | None:
+        row = self._conn.execute(
+            f"SELECT {', '.join(COLUMNS)}, extra FROM tickets WHERE channel_id = ?", (str(channel_id),)
+        ).fetchone()
+        return row_to_ticket(row)
+
+    # ---------- import ----------
+
+    def _import_json_once(self, json_path: str) -> int:
+        if self._meta_get("imported_from_json"):
+            return 0
+        return self._import_json(json_path)
+
+    def _import_json(self, json_path: str) -> int:
+        # the JSON store only writes its snapshot on compaction, so a young store may be
+        # nothing but a journal; loading it replays both
+        json_store = TicketStore(json_path)
+        db = json_store.db
+        json_store._executor.shutdown(wait=True)
+
+        count = 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for channel_id, ticket in db.get("tickets_by_channel", {}).items():
+                ticket = dict(ticket)
+                ticket.setdefault("channel_id", channel_id)
+                ticket.setdefault("status", "open")
+                self._put(ticket)
+                count += 1
+            last = max(int(db.get("last_ticket_number", 0)), int(self._meta_get("last_ticket_number", 0)))
+            self._meta_set("last_ticket_number", last)
+            for key, value in db.items():
+                if key not in ("last_ticket_number", "open_tickets_by_user", "tickets_by_channel"):
+                    self._meta_set(key, value)
+            self._meta_set("imported_from_json", {"path": json_path, "tickets": count, "at": time.time()})
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return count
+
+    async def import_json(self, json_path: str) -> int:
+        return await self._run(self._import_json, json_path)
+
+    # ---------- lifecycle ----------
+
+    async def flush(self) -> None:
+        await self._run(lambda: None)
+
+    async def compact(self) -> None:
+        await self._run(self._conn.execute, "PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def close(self) -> None:
+        def _close():
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+        await self._run(_close)
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    # ---------- queries ----------
+
+    async def get_ticket(self, channel_id) -> dict | None:
+        ticket = await self._run(self._get, channel_id)
+        if ticket and ticket.get("status") not in OPEN_STATUSES:
+            return None
+        return ticket
+
+    async def get_open_channel_id(self, user_id) -> str | None:
+        def _q():
+            row = self._conn.execute(
+                "SELECT channel_id FROM tickets WHERE opener_id = ? AND status IN ('open', 'claimed') "
+                "ORDER BY opened_at DESC, ticket_number DESC LIMIT 1",
+                (str(user_id),),
+            ).fetchone()
+            return row[0] if row else None
+        return await self._run(_q)
+
+    async def open_tickets(self) -> list[dict]:
+        return await self.find_tickets(status=OPEN_STATUSES)
+
+    async def find_tickets(self, status=None, opener_id=None, claimed_by=None, type=None, opened_after: float | None = None, opened_before: float | None = None, limit: int | None = None) -> list[dict]:
+        clauses, params = [], []
+        for column, value in (("status", status), ("opener_id", opener_id), ("claimed_by", claimed_by), ("type", type)):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{column} IN ({', '.join('?' for _ in value)})")
+                params.extend(str(v) for v in value)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(str(value))
+        if opened_after is not None:
+            clauses.append("opened_at >= ?")
+            params.append(opened_after)
+        if opened_before is not None:
+            clauses.append("opened_at < ?")
+            params.append(opened_before)
+
+        sql = f"SELECT {', '.join(COLUMNS)}, extra FROM tickets"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ticket_number"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        def _q():
+            return [row_to_ticket(r) for r in self._conn.execute(sql, params)]
+        return await self._run(_q)
+
+    async def get_last_ticket_number(self) -> int:
+        return int(await self._run(self._meta_get, "last_ticket_number", 0))
+
+    # ---------- mutations ----------
+
+    async def reserve_ticket_numbers(self, count: int) -> int:
+        def _reserve():
+            start = max(int(self._meta_get("reserved_through", 0)), int(self._meta_get("last_ticket_number", 0))) + 1
+            self._meta_set("reserved_through", start + count - 1)
+            return start
+        return await self._run(_reserve)
+
+    async def add_ticket(self, ticket: dict) -> dict:
+        ticket = dict(ticket)
+        ticket["channel_id"] = str(ticket["channel_id"])
+        ticket["opener_id"] = str(ticket["opener_id"])
+        ticket.setdefault("status", "open")
+
+        def _add():
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._put(ticket)
+                last = int(self._meta_get("last_ticket_number", 0))
+                if int(ticket.get("ticket_number", 0)) > last:
+                    self._meta_set("last_ticket_number", int(ticket["ticket_number"]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        await self._run(_add)
+        return ticket
+
+    async def update_ticket(self, channel_id, **fields) -> dict | None:
+        def _update():
+            ticket = self._get(channel_id)
+            if not ticket or ticket.get("status") not in OPEN_STATUSES:
+                return None
+            ticket.update(fields)
+            self._put(ticket)
+            return ticket
+        return await self._run(_update)
+
+    async def claim_ticket(self, channel_id, staff_id) -> tuple[bool, dict | None]:
+        def _claim():
+            cur = self._conn.execute(
+                "UPDATE tickets SET claimed_by = ?, status = 'claimed' "
+                "WHERE channel_id = ? AND claimed_by IS NULL AND status IN ('open', 'claimed')",
+                (str(staff_id), str(channel_id)),
+            )
+            ticket = self._get(channel_id)
+            if ticket and ticket.get("status") not in OPEN_STATUSES:
+                ticket = None
+            return cur.rowcount == 1, ticket
+        return await self._run(_claim)
+
+    async def remove_ticket(self, channel_id) -> dict | None:
+        def _close():
+            ticket = self._get(channel_id)
+            if not ticket or ticket.get("status") not in OPEN_STATUSES:
+                return None
+            closed_at = time.time()
+            self._conn.execute(
+                "UPDATE tickets SET status = 'closed', closed_at = ? WHERE channel_id = ?",
+                (closed_at, str(channel_id)),
+            )
+            return ticket
+        return await self._run(_close)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python sqlite_store.py <tickets.json> <tickets.db>")
+        sys.exit(1)
+    s = SqliteTicketStore(sys.argv[2])
+    n = s._executor.submit(s._import_json, sys.argv[1]).result()
+    s._executor.submit(s._conn.close).result()
+    print(f"Imported {n} tickets from {sys.argv[1]} into {sys.argv[2]}")
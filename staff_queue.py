@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+
+from ticket_store import atomic_write
+
+
+class IndexedHeap:
+    # Binary min-heap with a position index, so any item's key can be changed or the
+    # item removed in O(log n) instead of rebuilding the heap.
+
+    def __init__(self):
+        self._items: list[tuple[tuple, str]] = []
+        self._pos: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._pos
+
+    def peek(self) -> tuple[tuple, str] | None:
+        return self._items[0] if self._items else None
+
+    def set(self, item: str, key: tuple) -> None:
+        i = self._pos.get(item)
+        if i is None:
+            self._items.append((key, item))
+            self._pos[item] = len(self._items) - 1
+            self._up(len(self._items) - 1)
+            return
+        old = self._items[i][0]
+        self._items[i] = (key, item)
+        if key < old:
+            self._up(i)
+        else:
+            self._down(i)
+
+    def remove(self, item: str) -> None:
+        i = self._pos.pop(item, None)
+        if i is None:
+            return
+        last = self._items.pop()
+        if i < len(self._items):
+            self._items[i] = last
+            self._pos[last[1]] = i
+            self._up(i)
+            self._down(self._pos[last[1]])
+
+    def _swap(self, a: int, b: int) -> None:
+        self._items[a], self._items[b] = self._items[b], self._items[a]
+        self._pos[self._items[a][1]] = a
+        self._pos[self._items[b][1]] = b
+
+    def _up(self, i: int) -> None:
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._items[i][0] >= self._items[parent][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _down(self, i: int) -> None:
+        n = len(self._items)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._items[child][0] < self._items[smallest][0]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+
+class StaffAssigner:
+    # Staff who are on duty, keyed by (open claims, assignment sequence) in one indexed
+    # heap per ticket type they handle, so the least-loaded one is at the top and a claim
+    # or close only re-sifts that member. Staff without configured skills handle every
+    # type. Only the duty roster is saved (save()); claim counts are rebuilt from the
+    # open tickets on load.
+
+    def __init__(self, roster_file: str, ticket_types: list[str], skills: dict[str, list[str]] | None = None, max_open: int = 0):
+        self.roster_file = roster_file
+        self.ticket_types = list(ticket_types)
+        self.skills = {str(k): list(v) for k, v in (skills or {}).items()}
+        self.max_open = int(max_open or 0)
+
+        self.loads: dict[str, int] = {}
+        self._seq = 0
+        self._order: dict[str, int] = {}
+        self._heaps: dict[str, IndexedHeap] = {t: IndexedHeap() for t in self.ticket_types}
+
+    # ---------- roster ----------
+
+    def load_roster(self, open_tickets: list[dict]) -> None:
+        on_duty = []
+        if os.path.exists(self.roster_file):
+            with open(self.roster_file, "r", encoding="utf-8") as f:
+                on_duty = json.load(f).get("on_duty", [])
+        claims = self.count_claims(open_tickets)
+        for staff_id in on_duty:
+            self._add(str(staff_id), claims.get(str(staff_id), 0))
+
+    @staticmethod
+    def count_claims(open_tickets: list[dict]) -> dict[str, int]:
+        claims: dict[str, int] = {}
+        for t in open_tickets:
+            if t.get("claimed_by"):
+                claims[str(t["claimed_by"])] = claims.get(str(t["claimed_by"]), 0) + 1
+        return claims
+
+    async def save(self) -> None:
+        data = json.dumps({"on_duty": sorted(self.loads)}, indent=4).encode("utf-8")
+        await asyncio.to_thread(atomic_write, self.roster_file, data)
+
+    def is_on_duty(self, staff_id) -> bool:
+        return str(staff_id) in self.loads
+
+    def on_duty(self, staff_id, open_claims: int) -> None:
+        self._add(str(staff_id), open_claims)
+
+    def off_duty(self, staff_id) -> None:
+        staff_id = str(staff_id)
+        self.loads.pop(staff_id, None)
+        self._order.pop(staff_id, None)
+        for heap in self._heaps.values():
+            heap.remove(staff_id)
+
+    def _add(self, staff_id: str, open_claims: int) -> None:
+        self.loads[staff_id] = int(open_claims)
+        self._seq += 1
+        self._order[staff_id] = self._seq
+        for t in self.skills.get(staff_id) or self.ticket_types:
+            if t in self._heaps:
+                self._heaps[t].set(staff_id, (self.loads[staff_id], self._order[staff_id]))
+
+    def _resift(self, staff_id: str) -> None:
+        key = (self.loads[staff_id], self._order[staff_id])
+        for heap in self._heaps.values():
+            if staff_id in heap:
+                heap.set(staff_id, key)
+
+    # ---------- assignment ----------
+
+    def assign(self, ticket_type: str) -> str | None:
+        heap = self._heaps.get(ticket_type)
+        top = heap.peek() if heap else None
+        if top is None:
+            return None
+        staff_id = top[1]
+        if self.max_open and self.loads[staff_id] >= self.max_open:
+            return None
+        self.loads[staff_id] += 1
+        # ties go to whoever was assigned least recently
+        self._seq += 1
+        self._order[staff_id] = self._seq
+        self._resift(staff_id)
+        return staff_id
+
+    def claimed(self, staff_id) -> None:
+        staff_id = str(staff_id)
+        if staff_id in self.loads:
+            self.loads[staff_id] += 1
+            self._resift(staff_id)
+
+    def released(self, staff_id) -> None:
+        staff_id = str(staff_id) if staff_id else None
+        if staff_id in self.loads and self.loads[staff_id] > 0:
+            self.loads[staff_id] -= 1
+            self._resift(staff_id)
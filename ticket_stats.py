@@ -0,0 +1,252 @@
+import asyncio
+import json
+import os
+import time
+
+from ticket_store import atomic_write
+
+FIRST_RESPONSE_BUCKETS = [60, 300, 900, 1800, 3600, 4 * 3600, 12 * 3600, 24 * 3600]
+RESOLUTION_BUCKETS = [900, 3600, 4 * 3600, 12 * 3600, 24 * 3600, 3 * 86400, 7 * 86400]
+WINDOWS = {"24h": 24, "7d": 7 * 24, "30d": 30 * 24}
+HOURS_KEPT = 30 * 24
+
+
+def empty_state() -> dict:
+    return {
+        "offset": 0,
+        "totals": {"opened": 0, "claimed": 0, "closed": 0, "open_claimed": 0},
+        "per_staff": {},
+        "per_type": {},
+        "first_response": new_histogram(FIRST_RESPONSE_BUCKETS),
+        "resolution": new_histogram(RESOLUTION_BUCKETS),
+        "hours": {},
+        "open": {},
+    }
+
+def new_histogram(edges: list[int]) -> dict:
+    return {"edges": list(edges), "counts": [0] * (len(edges) + 1), "sum": 0.0, "count": 0}
+
+def observe(hist: dict, value: float) -> None:
+    value = max(0.0, float(value))
+    for i, edge in enumerate(hist["edges"]):
+        if value <= edge:
+            hist["counts"][i] += 1
+            break
+    else:
+        hist["counts"][-1] += 1
+    hist["sum"] += value
+    hist["count"] += 1
+
+def quantile(hist: dict, q: float) -> float | None:
+    # upper edge of the bucket holding the q-th observation
+    if not hist["count"]:
+        return None
+    target = q * hist["count"]
+    seen = 0
+    for i, n in enumerate(hist["counts"]):
+        seen += n
+        if seen >= target:
+            return float(hist["edges"][i]) if i < len(hist["edges"]) else float("inf")
+    return float("inf")
+
+def apply_event(state: dict, e: dict) -> None:
+    kind = e.get("e")
+    ts = float(e.get("ts", 0))
+    channel_id = str(e.get("channel_id"))
+    hour = str(int(ts // 3600))
+    totals = state["totals"]
+
+    if kind == "open":
+        totals["opened"] += 1
+        t = state["per_type"].setdefault(e.get("type") or "Unknown", {"opened": 0, "closed": 0})
+        t["opened"] += 1
+        state["hours"].setdefault(hour, {"opened": 0, "closed": 0})["opened"] += 1
+        state["open"][channel_id] = {"opened_at": ts, "type": e.get("type"), "responded": False}
+
+    elif kind == "seed":
+        if channel_id not in state["open"]:
+            claimed = bool(e.get("claimed_by"))
+            state["open"][channel_id] = {"opened_at": ts, "type": e.get("type"), "responded": claimed, "claimed": claimed}
+            totals["open_claimed"] += int(claimed)
+
+    elif kind == "claim":
+        totals["claimed"] += 1
+        s = state["per_staff"].setdefault(str(e.get("staff_id")), {"claims": 0, "closes": 0})
+        s["claims"] += 1
+        info = state["open"].get(channel_id)
+        if info and not info.get("claimed"):
+            info["claimed"] = True
+            totals["open_claimed"] += 1
+
+    elif kind == "response":
+        info = state["open"].get(channel_id)
+        if info and not info["responded"]:
+            info["responded"] = True
+            observe(state["first_response"], ts - info["opened_at"])
+
+    elif kind == "close":
+        totals["closed"] += 1
+        info = state["open"].pop(channel_id, None)
+        ticket_type = e.get("type") or (info or {}).get("type") or "Unknown"
+        state["per_type"].setdefault(ticket_type, {"opened": 0, "closed": 0})["closed"] += 1
+        state["hours"].setdefault(hour, {"opened": 0, "closed": 0})["closed"] += 1
+        # credited to the staff member who handled the ticket, not to whoever pressed
+        # close (often the opener, or the bot for auto-closes)
+        if e.get("claimed_by"):
+            s = state["per_staff"].setdefault(str(e["claimed_by"]), {"claims": 0, "closes": 0})
+            s["closes"] += 1
+        if info:
+            observe(state["resolution"], ts - info["opened_at"])
+            if info.get("claimed"):
+                totals["open_claimed"] -= 1
+
+    prune_hours(state, ts)
+
+def prune_hours(state: dict, now: float) -> None:
+    oldest = int(now // 3600) - HOURS_KEPT
+    if len(state["hours"]) <= HOURS_KEPT + 24:
+        return
+    for h in [h for h in state["hours"] if int(h) < oldest]:
+        del state["hours"][h]
+
+
+class TicketStats:
+    # Every open/claim/first response/close is appended to an event log, and aggregates
+    # are updated as each event is recorded. The aggregates are checkpointed to
+    # `state_file` together with the event-log offset they cover, so startup only
+    # replays the tail. rebuild() recomputes everything from the full log.
+
+    def __init__(self, events_file: str = "ticket_events.jsonl", state_file: str = "ticket_stats.json", checkpoint_every: int = 200, flush_interval: float = 0.5):
+        self.events_file = events_file
+        self.state_file = state_file
+        self.checkpoint_every = checkpoint_every
+        self.flush_interval = flush_interval
+
+        self.state = empty_state()
+        self.fresh = True
+        self._pending: list[str] = []
+        self._since_checkpoint = 0
+        self._flush_task: asyncio.Task | None = None
+        self._write_lock = asyncio.Lock()
+        self._load()
+
+    # ---------- startup ----------
+
+    def _load(self) -> None:
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+            self.fresh = False
+        if os.path.exists(self.events_file):
+            self.fresh = False
+            self.state["offset"] = self._replay(self.state, int(self.state.get("offset", 0)))
+
+    def _replay(self, state: dict, offset: int) -> int:
+        with open(self.events_file, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    apply_event(state, json.loads(raw))
+                except ValueError:
+                    pass
+                offset += len(raw)
+        return offset
+
+    # ---------- recording ----------
+
+    def record(self, kind: str, **fields) -> None:
+        e = {"e": kind, "ts": fields.pop("ts", None) or time.time(), **fields}
+        apply_event(self.state, e)
+        self._pending.append(json.dumps(e, separators=(",", ":")) + "\n")
+        self._since_checkpoint += 1
+        if self._flush_task and not self._flush_task.done():
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        except RuntimeError:
+            pass
+
+    def seed_open(self, tickets: list[dict]) -> None:
+        # first run with history: adopt tickets that were opened before events existed
+        for t in tickets:
+            self.record(
+                "seed",
+                channel_id=t.get("channel_id"),
+                type=t.get("type"),
+                ts=t.get("opened_at") or time.time(),
+                claimed_by=t.get("claimed_by"),
+            )
+
+    def needs_response(self, channel_id) -> bool:
+        info = self.state["open"].get(str(channel_id))
+        return bool(info) and not info["responded"]
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self, checkpoint: bool = False) -> None:
+        async with self._write_lock:
+            lines, self._pending = self._pending, []
+            data = "".join(lines).encode("utf-8")
+            self.state["offset"] = int(self.state.get("offset", 0)) + len(data)
+            snapshot = None
+            if checkpoint or self._since_checkpoint >= self.checkpoint_every:
+                # serialised before any await, so it covers exactly the events up to `offset`
+                self._since_checkpoint = 0
+                snapshot = json.dumps(self.state, separators=(",", ":")).encode("utf-8")
+            if data:
+                await asyncio.to_thread(self._append, data)
+            if snapshot is not None:
+                await asyncio.to_thread(atomic_write, self.state_file, snapshot)
+
+    def _append(self, data: bytes) -> None:
+        with open(self.events_file, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def close(self) -> None:
+        await self.flush(checkpoint=True)
+
+    async def rebuild(self) -> dict:
+        async with self._write_lock:
+            lines, self._pending = self._pending, []
+            if lines:
+                await asyncio.to_thread(self._append, "".join(lines).encode("utf-8"))
+
+            def _rebuild():
+                state = empty_state()
+                if os.path.exists(self.events_file):
+                    state["offset"] = self._replay(state, 0)
+                return state
+
+            self.state = await asyncio.to_thread(_rebuild)
+            self._since_checkpoint = 0
+            data = json.dumps(self.state, separators=(",", ":")).encode("utf-8")
+            await asyncio.to_thread(atomic_write, self.state_file, data)
+        return self.state
+
+    # ---------- queries ----------
+
+    def window(self, name: str, now: float | None = None) -> dict:
+        now = now or time.time()
+        first = int(now // 3600) - WINDOWS[name] + 1
+        out = {"opened": 0, "closed": 0}
+        for h, counts in self.state["hours"].items():
+            if int(h) >= first:
+                out["opened"] += counts["opened"]
+                out["closed"] += counts["closed"]
+        return out
+
+    def open_count(self) -> int:
+        return len(self.state["open"])
+
+    def claimed_count(self) -> int:
+        return int(self.state["totals"].get("open_claimed", 0))
+
+    def top_staff(self, n: int = 5, key: str = "claims") -> list[tuple[str, dict]]:
+        ranked = [kv for kv in self.state["per_staff"].items() if kv[1][key] > 0]
+        return sorted(ranked, key=lambda kv: kv[1][key], reverse=True)[:n]
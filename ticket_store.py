@@ -0,0 +1,296 @@
+import asyncio
+import json
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def empty_db() -> dict:
+    return {
+        "last_ticket_number": 0,
+        "open_tickets_by_user": {},
+        "tickets_by_channel": {}
+    }
+
+def fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+# Append-only JSON-lines journals next to a snapshot file, shared by the ticket store
+# and the transcript job queue.
+
+def replay_journal(path: str, apply) -> int:
+    # calls apply(entry) for every complete line and returns how many there were
+    if not os.path.exists(path):
+        return 0
+    count = good_bytes = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                break
+            apply(entry)
+            count += 1
+            good_bytes += len(raw)
+
+    # a crash mid-append leaves a torn last line; drop it so later appends stay parseable
+    if good_bytes != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+            os.fsync(f.fileno())
+    return count
+
+def append_journal(path: str, lines: list[str]) -> None:
+    with open(path, "ab") as f:
+        f.write("".join(lines).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+def write_snapshot(path: str, journal_path: str, data: bytes) -> None:
+    # everything in the journal is in the snapshot, so it starts over empty
+    atomic_write(path, data)
+    with open(journal_path, "wb") as f:
+        os.fsync(f.fileno())
+
+
+class TicketStore:
+    # The dict below is the single source of truth. Every mutation is applied in memory
+    # immediately and appended to a journal that a background thread writes with fsync.
+    # Every `compact_every` journal entries the whole db is written as a snapshot to
+    # `path` (same layout as the old tickets.json) and the journal is truncated.
+    # Stores for many guilds can share one writer thread by passing the same `executor`;
+    # a shared executor is left running by close().
+
+    def __init__(self, path: str = "tickets.json", journal_path: str | None = None, compact_every: int = 500, flush_interval: float = 0.25, executor: ThreadPoolExecutor | None = None):
+        self.path = path
+        self.journal_path = journal_path or f"{path}.journal"
+        self.compact_every = compact_every
+        self.flush_interval = flush_interval
+
+        self.db = empty_db()
+        self._journal_entries = 0
+        self._pending: list[dict] = []
+        self._snapshot_requested = False
+        self._flush_task: asyncio.Task | None = None
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="ticket-store")
+
+        self._load()
+
+    # ---------- startup ----------
+
+    def _load(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                db = json.load(f)
+            db.setdefault("last_ticket_number", 0)
+            db.setdefault("open_tickets_by_user", {})
+            db.setdefault("tickets_by_channel", {})
+            self.db = db
+
+        self._journal_entries = replay_journal(self.journal_path, self._apply)
+        if self._journal_entries >= self.compact_every:
+            self._snapshot_requested = True
+
+    def _apply(self, entry: dict) -> None:
+        op = entry.get("op")
+        by_channel = self.db["tickets_by_channel"]
+        by_user = self.db["open_tickets_by_user"]
+
+        if op == "put":
+            ticket = entry["ticket"]
+            channel_id = str(ticket["channel_id"])
+            by_channel[channel_id] = ticket
+            if ticket.get("opener_id") is not None:
+                by_user[str(ticket["opener_id"])] = channel_id
+            self.db["last_ticket_number"] = max(int(self.db.get("last_ticket_number", 0)), int(ticket.get("ticket_number", 0)))
+        elif op == "del":
+            channel_id = str(entry["channel_id"])
+            ticket = by_channel.pop(channel_id, None)
+            if ticket and by_user.get(str(ticket.get("opener_id"))) == channel_id:
+                by_user.pop(str(ticket.get("opener_id")), None)
+        elif op == "meta":
+            self.db[entry["key"]] = entry["value"]
+
+    # ---------- persistence ----------
+
+    def _record(self, entry: dict) -> None:
+        self._apply(entry)
+        self._pending.append(entry)
+        self._journal_entries += 1
+        if self._journal_entries >= self.compact_every:
+            self._snapshot_requested = True
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_batch(self._take_batch())
+            return
+        self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _take_batch(self) -> tuple[list[dict], dict | None]:
+        entries, self._pending = self._pending, []
+        snapshot = None
+        if self._snapshot_requested:
+            self._snapshot_requested = False
+            self._journal_entries = 0
+            # records are replaced, never mutated in place, so shallow copies are a consistent view
+            snapshot = dict(self.db)
+            snapshot["open_tickets_by_user"] = dict(self.db["open_tickets_by_user"])
+            snapshot["tickets_by_channel"] = dict(self.db["tickets_by_channel"])
+        return entries, snapshot
+
+    def _write_batch(self, batch: tuple[list[dict], dict | None]) -> None:
+        entries, snapshot = batch
+        if entries:
+            append_journal(self.journal_path, [json.dumps(e, separators=(",", ":")) + "\n" for e in entries])
+        if snapshot is not None:
+            write_snapshot(self.path, self.journal_path, json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+
+    async def flush(self) -> None:
+        batch = self._take_batch()
+        if not batch[0] and batch[1] is None:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write_batch, batch)
+
+    async def compact(self) -> None:
+        self._snapshot_requested = True
+        await self.flush()
+
+    async def close(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    # ---------- queries ----------
+
+    async def get_ticket(self, channel_id) -> dict | None:
+        ticket = self.db["tickets_by_channel"].get(str(channel_id))
+        return dict(ticket) if ticket else None
+
+    async def get_open_channel_id(self, user_id) -> str | None:
+        return self.db["open_tickets_by_user"].get(str(user_id))
+
+    async def open_tickets(self) -> list[dict]:
+        return [dict(t) for t in self.db["tickets_by_channel"].values()]
+
+    async def find_tickets(self, status=None, opener_id=None, claimed_by=None, type=None, opened_after: float | None = None, opened_before: float | None = None, limit: int | None = None) -> list[dict]:
+        filters = {}
+        for key, value in (("status", status), ("opener_id", opener_id), ("claimed_by", claimed_by), ("type", type)):
+            if value is not None:
+                filters[key] = {str(v) for v in value} if isinstance(value, (list, tuple, set)) else {str(value)}
+
+        out = []
+        for t in self.db["tickets_by_channel"].values():
+            if any(str(t.get(k)) not in allowed for k, allowed in filters.items()):
+                continue
+            opened_at = t.get("opened_at")
+            if opened_after is not None and (opened_at is None or opened_at < opened_after):
+                continue
+            if opened_before is not None and (opened_at is None or opened_at >= opened_before):
+                continue
+            out.append(dict(t))
+        out.sort(key=lambda t: int(t.get("ticket_number", 0)))
+        return out[:limit] if limit else out
+
+    async def get_last_ticket_number(self) -> int:
+        return int(self.db.get("last_ticket_number", 0))
+
+    # ---------- mutations ----------
+
+    async def reserve_ticket_numbers(self, count: int) -> int:
+        start = max(int(self.db.get("reserved_through", 0)), int(self.db.get("last_ticket_number", 0))) + 1
+        self._record({"op": "meta", "key": "reserved_through", "value": start + count - 1})
+        # the high-water mark must be on disk before any number from the block is used
+        await self.flush()
+        return start
+
+    async def add_ticket(self, ticket: dict) -> dict:
+        ticket = dict(ticket)
+        ticket["channel_id"] = str(ticket["channel_id"])
+        ticket["opener_id"] = str(ticket["opener_id"])
+        self._record({"op": "put", "ticket": ticket})
+        return dict(ticket)
+
+    async def update_ticket(self, channel_id, **fields) -> dict | None:
+        ticket = self.db["tickets_by_channel"].get(str(channel_id))
+        if not ticket:
+            return None
+        ticket = {**ticket, **fields, "channel_id": str(channel_id)}
+        self._record({"op": "put", "ticket": ticket})
+        return dict(ticket)
+
+    async def claim_ticket(self, channel_id, staff_id) -> tuple[bool, dict | None]:
+        ticket = self.db["tickets_by_channel"].get(str(channel_id))
+        if not ticket:
+            return False, None
+        if ticket.get("claimed_by") is not None:
+            return False, dict(ticket)
+        return True, await self.update_ticket(channel_id, claimed_by=str(staff_id), status="claimed")
+
+    async def remove_ticket(self, channel_id) -> dict | None:
+        ticket = self.db["tickets_by_channel"].get(str(channel_id))
+        if not ticket:
+            return None
+        self._record({"op": "del", "channel_id": str(channel_id)})
+        return dict(ticket)
+
+
+class TicketNumberAllocator:
+    # Hands out ticket numbers from memory. Only the end of each reserved block is
+    # persisted, so a restart skips at most `block_size - 1` numbers but never repeats one.
+
+    def __init__(self, store, block_size: int = 20):
+        self.store = store
+        self.block_size = max(1, int(block_size))
+        self._next = 1
+        self._end = 0
+        self._reserve_lock = asyncio.Lock()
+
+    async def next(self) -> int:
+        while self._next > self._end:
+            async with self._reserve_lock:
+                if self._next > self._end:
+                    start = await self.store.reserve_ticket_numbers(self.block_size)
+                    self._next, self._end = start, start + self.block_size - 1
+        n = self._next
+        self._next += 1
+        return n
+
+    def skip_past(self, n: int) -> None:
+        # used when an existing ticket number is re-registered (e.g. an adopted channel);
+        # the store's high-water mark already covers it, so the next block starts above it
+        if n >= self._next:
+            self._next = n + 1
@@ -0,0 +1,301 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha  TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transcripts (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_number INTEGER,
+    guild_id      TEXT,
+    channel_id    TEXT,
+    channel_name  TEXT,
+    opener_id     TEXT,
+    claimed_by    TEXT,
+    type          TEXT,
+    closed_at     REAL NOT NULL,
+    last_access   REAL NOT NULL,
+    sha           TEXT NOT NULL REFERENCES blobs (sha)
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_number ON transcripts (ticket_number, closed_at);
+CREATE INDEX IF NOT EXISTS idx_transcripts_opener ON transcripts (opener_id);
+CREATE INDEX IF NOT EXISTS idx_transcripts_closed_at ON transcripts (closed_at);
+CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts (last_access);
+CREATE INDEX IF NOT EXISTS idx_transcripts_sha ON transcripts (sha);
+CREATE INDEX IF NOT EXISTS idx_transcripts_claimed_by ON transcripts (claimed_by);
+CREATE INDEX IF NOT EXISTS idx_transcripts_type ON transcripts (type);
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5 (body, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+def fts_query(text: str) -> str:
+    # quote every term so user input can never be parsed as FTS5 syntax
+    terms = [t.replace('"', '""') for t in text.split() if t.strip()]
+    return " ".join(f'"{t}"' for t in terms)
+
+def gzip_bytes(data: bytes) -> bytes:
+    # mtime=0 keeps the output deterministic so identical transcripts share a blob
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+class TranscriptArchive:
+    # Transcripts are stored gzip-compressed under blobs/<aa>/<bb>/<sha256>.html.gz and
+    # deduplicated by content. index.db maps ticket metadata to blobs; lookups go through
+    # its indexes so nothing is loaded into memory up front. Retention drops entries older
+    # than max_age_days and then evicts least recently accessed entries until the blobs
+    # fit in max_total_bytes. Tickets closed without a saved transcript are indexed for
+    # search only, with an empty sha and no blob.
+
+    def __init__(self, root: str = "./transcripts", max_age_days: float = 0, max_total_bytes: int = 0):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcript-archive")
+        self._conn: sqlite3.Connection | None = None
+        self._prune_task: asyncio.Task | None = None
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, "index.db"), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def blob_path(self, sha: str) -> str:
+        return os.path.join(self.blob_dir, sha[:2], sha[2:4], f"{sha}.html.gz")
+
+    # ---------- write ----------
+
+    def _store(self, data: bytes, compressed: bool, meta: dict, text: str | None) -> int:
+        blob = data if compressed else gzip_bytes(data)
+        sha = hashlib.sha256(blob).hexdigest()
+        path = self.blob_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO blobs (sha, size, refs) VALUES (?, ?, 1) "
+                "ON CONFLICT(sha) DO UPDATE SET refs = refs + 1",
+                (sha, len(blob)),
+            )
+            cur = conn.execute(
+                "INSERT INTO transcripts (ticket_number, guild_id, channel_id, channel_name, opener_id, claimed_by, type, closed_at, last_access, sha) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    meta.get("ticket_number"),
+                    _str(meta.get("guild_id")),
+                    _str(meta.get("channel_id")),
+                    meta.get("channel_name"),
+                    _str(meta.get("opener_id")),
+                    _str(meta.get("claimed_by")),
+                    meta.get("type"),
+                    meta.get("closed_at") or now,
+                    now,
+                    sha,
+                ),
+            )
+            if text:
+                conn.execute("INSERT INTO transcripts_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, text))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._enforce()
+        return cur.lastrowid
+
+    async def store(self, artifact, meta: dict, text: str | None = None) -> int:
+        compressed = artifact.filename.endswith(".gz")
+        return await self._run(self._store, artifact.data, compressed, meta, text)
+
+    def _index(self, meta: dict, text: str | None) -> int:
+        now = time.time()
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute(
+                "INSERT INTO transcripts (ticket_number, guild_id, channel_id, channel_name, opener_id, claimed_by, type, closed_at, last_access, sha) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '')",
+                (
+                    meta.get("ticket_number"),
+                    _str(meta.get("guild_id")),
+                    _str(meta.get("channel_id")),
+                    meta.get("channel_name"),
+                    _str(meta.get("opener_id")),
+                    _str(meta.get("claimed_by")),
+                    meta.get("type"),
+                    meta.get("closed_at") or now,
+                    now,
+                ),
+            )
+            if text:
+                conn.execute("INSERT INTO transcripts_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, text))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._enforce()
+        return cur.lastrowid
+
+    async def index(self, meta: dict, text: str | None = None) -> int:
+        # search entry for a ticket whose transcript is not kept on disk
+        return await self._run(self._index, meta, text)
+
+    # ---------- read ----------
+
+    def _find(self, ticket_number: int, guild_id=None) -> dict | None:
+        conn = self._db()
+        sql = "SELECT id, channel_name, sha, closed_at FROM transcripts WHERE ticket_number = ? AND sha != ''"
+        params: list = [int(ticket_number)]
+        if guild_id is not None:
+            sql += " AND guild_id = ?"
+            params.append(str(guild_id))
+        row = conn.execute(sql + " ORDER BY closed_at DESC LIMIT 1", params).fetchone()
+        if not row:
+            return None
+        conn.execute("UPDATE transcripts SET last_access = ? WHERE id = ?", (time.time(), row[0]))
+        return {"id": row[0], "channel_name": row[1], "sha": row[2], "closed_at": row[3], "path": self.blob_path(row[2])}
+
+    async def find(self, ticket_number: int, guild_id=None) -> dict | None:
+        return await self._run(self._find, ticket_number, guild_id)
+
+    def _search(self, query: str, opener_id=None, claimed_by=None, type=None, closed_after: float | None = None, closed_before: float | None = None, guild_id=None, limit: int = 10) -> list[dict]:
+        clauses, params = [], []
+        match = fts_query(query or "")
+        if match:
+            sql = (
+                "SELECT t.ticket_number, t.channel_name, t.opener_id, t.claimed_by, t.type, t.closed_at, bm25(transcripts_fts) AS rank "
+                "FROM transcripts_fts JOIN transcripts t ON t.id = transcripts_fts.rowid"
+            )
+            clauses.append("transcripts_fts MATCH ?")
+            params.append(match)
+        else:
+            sql = "SELECT t.ticket_number, t.channel_name, t.opener_id, t.claimed_by, t.type, t.closed_at, 0 AS rank FROM transcripts t"
+
+        for column, value in (("guild_id", guild_id), ("opener_id", opener_id), ("claimed_by", claimed_by), ("type", type)):
+            if value is not None:
+                clauses.append(f"t.{column} = ?")
+                params.append(str(value))
+        if closed_after is not None:
+            clauses.append("t.closed_at >= ?")
+            params.append(closed_after)
+        if closed_before is not None:
+            clauses.append("t.closed_at < ?")
+            params.append(closed_before)
+
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY rank, t.closed_at DESC LIMIT ?"
+        params.append(int(limit))
+
+        keys = ("ticket_number", "channel_name", "opener_id", "claimed_by", "type", "closed_at", "rank")
+        return [dict(zip(keys, row)) for row in self._db().execute(sql, params)]
+
+    async def search(self, query: str, **filters) -> list[dict]:
+        return await self._run(lambda: self._search(query, **filters))
+
+    def open_blob(self, entry: dict):
+        # decompresses lazily as the caller reads, so large transcripts are never held whole
+        return gzip.open(entry["path"], "rb")
+
+    # ---------- retention ----------
+
+    def _delete_entries(self, ids: list[int]) -> tuple[int, int]:
+        conn = self._db()
+        removed = freed = 0
+        for entry_id in ids:
+            row = conn.execute("SELECT sha FROM transcripts WHERE id = ?", (entry_id,)).fetchone()
+            if not row:
+                continue
+            conn.execute("DELETE FROM transcripts WHERE id = ?", (entry_id,))
+            conn.execute("DELETE FROM transcripts_fts WHERE rowid = ?", (entry_id,))
+            removed += 1
+            if not row[0]:
+                continue
+            conn.execute("UPDATE blobs SET refs = refs - 1 WHERE sha = ?", (row[0],))
+            left = conn.execute("SELECT refs, size FROM blobs WHERE sha = ?", (row[0],)).fetchone()
+            if left and left[0] <= 0:
+                conn.execute("DELETE FROM blobs WHERE sha = ?", (row[0],))
+                freed += left[1]
+                try:
+                    os.remove(self.blob_path(row[0]))
+                except FileNotFoundError:
+                    pass
+        return removed, freed
+
+    def _enforce(self) -> int:
+        conn = self._db()
+        removed = 0
+        if self.max_age_days and self.max_age_days > 0:
+            cutoff = time.time() - self.max_age_days * 86400
+            ids = [r[0] for r in conn.execute("SELECT id FROM transcripts WHERE closed_at < ?", (cutoff,))]
+            removed += self._delete_entries(ids)[0]
+
+        if self.max_total_bytes and self.max_total_bytes > 0:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            while total > self.max_total_bytes:
+                row = conn.execute("SELECT id FROM transcripts WHERE sha != '' ORDER BY last_access LIMIT 1").fetchone()
+                if not row:
+                    break
+                n, freed = self._delete_entries([row[0]])
+                removed += n
+                total -= freed
+        return removed
+
+    async def enforce(self) -> int:
+        return await self._run(self._enforce)
+
+    async def start(self, interval: float = 3600.0) -> None:
+        # stores only prune when something new arrives; age limits also need a timer
+        if self._prune_task or not (self.max_age_days and self.max_age_days > 0):
+            return
+        self._prune_task = asyncio.create_task(self._prune(interval))
+
+    async def _prune(self, interval: float) -> None:
+        while True:
+            try:
+                removed = await self.enforce()
+                if removed:
+                    print(f"🧹 Pruned {removed} archived transcripts")
+            except Exception as e:
+                print(f"⚠️ Transcript retention failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        if self._prune_task:
+            self._prune_task.cancel()
+            await asyncio.gather(self._prune_task, return_exceptions=True)
+            self._prune_task = None
+        def _close():
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+        await self._run(_close)
+        self._executor.shutdown(wait=True)
+
+
+def _str(v):
+    return None if v is None else str(v)
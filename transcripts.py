@@ -0,0 +1,280 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+import time
+import uuid
+
+from ticket_store import append_journal, atomic_write, replay_journal, write_snapshot
+
+PRIORITY_FORCED = 0
+PRIORITY_NORMAL = 1
+
+
+class TranscriptArtifact:
+    # A transcript encoded exactly once. Every consumer (log upload, DM, disk copy)
+    # reads from the same immutable bytes through its own cheap BytesIO view.
+
+    def __init__(self, data: bytes, filename: str):
+        self.data = data
+        self.filename = filename
+        self.url: str | None = None
+
+    @classmethod
+    def from_html(cls, html: str, stem: str, compress: bool = False) -> "TranscriptArtifact":
+        data = html.encode("utf-8")
+        if compress:
+            return cls(gzip.compress(data, compresslevel=6, mtime=0), f"{stem}.html.gz")
+        return cls(data, f"{stem}.html")
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def open(self) -> io.BytesIO:
+        return io.BytesIO(self.data)
+
+
+class TranscriptQueue:
+    # Close requests become jobs with two stages:
+    #   capture - render the ticket's live log (backfilled from history if needed) into
+    #             a spool file; on_captured (channel deletion) runs only after this
+    #   deliver - log upload, DM and disk copy, tracked step by step in job["done"]
+    # Job changes go to a journal next to `jobs_file`. New jobs and finished captures are
+    # fsynced before the caller continues, so start() picks up anything pending after a
+    # restart; finished jobs and retry counts ride on a short delayed flush (a crash
+    # before it repeats a delivery at worst). Changes made while a write is in flight go
+    # out together in the next one. Every `compact_every` entries the jobs are written
+    # as a snapshot to `jobs_file` and the journal is truncated.
+
+    def __init__(self, capture, deliver, on_captured=None, jobs_file: str = "transcript_jobs.json", spool_dir: str = "./transcript_spool", workers: int = 2, max_attempts: int = 5, base_delay: float = 2.0, compress: bool = False, compact_every: int = 200, flush_interval: float = 0.25):
+        self.capture = capture
+        self.deliver = deliver
+        self.on_captured = on_captured
+        self.jobs_file = jobs_file
+        self.journal_path = f"{jobs_file}.journal"
+        self.compact_every = compact_every
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self.workers = max(1, int(workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.compress = compress
+
+        self.jobs: dict[str, dict] = {}
+        self._captured: dict[str, asyncio.Future] = {}
+        self._queue: asyncio.PriorityQueue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._callbacks: set[asyncio.Task] = set()
+        self._seq = 0
+        self._persist_lock = asyncio.Lock()
+        self._pending: list[str] = []
+        self._journal_entries = 0
+        self._flush_task: asyncio.Task | None = None
+
+        self._load()
+
+    def _load(self) -> None:
+        if os.path.exists(self.jobs_file):
+            with open(self.jobs_file, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f).get("jobs", {})
+        self._journal_entries = replay_journal(self.journal_path, self._apply)
+
+    def _apply(self, entry: dict) -> None:
+        if entry.get("op") == "put":
+            self.jobs[entry["job"]["id"]] = entry["job"]
+        elif entry.get("op") == "del":
+            self.jobs.pop(entry["id"], None)
+
+    # ---------- lifecycle ----------
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        for job in sorted(self.jobs.values(), key=lambda j: j.get("created_at", 0)):
+            self._enqueue(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in [*self._tasks, *self._callbacks]:
+            task.cancel()
+        await asyncio.gather(*self._callbacks, return_exceptions=True)
+        if self._flush_task and not self._flush_task.done():
+            self._tasks.append(self._flush_task)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # leave a compact snapshot and an empty journal behind on shutdown
+        self._journal_entries = max(self._journal_entries, self.compact_every)
+        await self._persist()
+
+    def pending(self) -> int:
+        return len(self.jobs)
+
+    # ---------- submit ----------
+
+    async def submit(self, job: dict, priority: int = PRIORITY_NORMAL) -> asyncio.Future:
+        job = {
+            "id": uuid.uuid4().hex,
+            "stage": "capture",
+            "priority": priority,
+            "attempts": 0,
+            "done": [],
+            "created_at": time.time(),
+            **job,
+        }
+        self.jobs[job["id"]] = job
+        fut = asyncio.get_running_loop().create_future()
+        self._captured[job["id"]] = fut
+        self._record({"op": "put", "job": job})
+        await self._persist()
+        self._enqueue(job)
+        return fut
+
+    def _enqueue(self, job: dict) -> None:
+        if self._queue is None or job["id"] not in self.jobs:
+            return
+        self._seq += 1
+        self._queue.put_nowait((job.get("priority", PRIORITY_NORMAL), self._seq, job["id"]))
+
+    # ---------- persistence ----------
+
+    def _record(self, entry: dict) -> None:
+        # serialized now: jobs keep changing in memory while the line waits for a write
+        self._pending.append(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._journal_entries += 1
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self._persist()
+
+    async def _persist(self) -> None:
+        # whoever holds the lock writes everything recorded so far; callers that queued
+        # behind it usually find their entries already on disk
+        async with self._persist_lock:
+            lines, self._pending = self._pending, []
+            snapshot = None
+            if self._journal_entries >= self.compact_every:
+                self._journal_entries = 0
+                snapshot = json.dumps({"jobs": self.jobs}, separators=(",", ":")).encode("utf-8")
+            if lines or snapshot is not None:
+                await asyncio.to_thread(self._write, lines, snapshot)
+
+    def _write(self, lines: list[str], snapshot: bytes | None) -> None:
+        if lines:
+            append_journal(self.journal_path, lines)
+        if snapshot is not None:
+            write_snapshot(self.jobs_file, self.journal_path, snapshot)
+
+    # ---------- workers ----------
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            if not job:
+                continue
+            try:
+                if job["stage"] == "capture":
+                    await self._run_capture(job)
+                if job["stage"] == "deliver":
+                    await self._run_deliver(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._retry_or_give_up(job, e)
+
+    async def _run_capture(self, job: dict) -> None:
+        html = await self.capture(job)
+        path = None
+        if html:
+            artifact = await asyncio.to_thread(TranscriptArtifact.from_html, html, f"transcript-{job.get('channel_name')}", self.compress)
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = os.path.join(self.spool_dir, f"{job['id']}.bin")
+            await asyncio.to_thread(atomic_write, path, artifact.data)
+            job["transcript_filename"] = artifact.filename
+        await self._finish_capture(job, path)
+
+    async def _finish_capture(self, job: dict, path: str | None) -> None:
+        job["spool_path"] = path
+        job["stage"] = "deliver"
+        job["attempts"] = 0
+        self._record({"op": "put", "job": job})
+        await self._persist()
+
+        fut = self._captured.pop(job["id"], None)
+        if fut and not fut.done():
+            fut.set_result(path is not None)
+        if self.on_captured:
+            task = asyncio.create_task(self._run_on_captured(job))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _run_on_captured(self, job: dict) -> None:
+        # not part of the job, so a failure is retried here rather than re-running a stage
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.on_captured(job)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= self.max_attempts:
+                    print(f"⚠️ Post-capture step for {job.get('channel_name')} failed: {e!r}")
+                    return
+                await asyncio.sleep(self._retry_delay(attempt))
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(60.0, self.base_delay * (2 ** (attempts - 1)))
+
+    async def _run_deliver(self, job: dict) -> None:
+        artifact = None
+        path = job.get("spool_path") or job.get("html_path")
+        if path and os.path.exists(path):
+            data = await asyncio.to_thread(_read_bytes, path)
+            artifact = TranscriptArtifact(data, job.get("transcript_filename") or f"transcript-{job.get('channel_name')}.html")
+            artifact.url = job.get("transcript_url")
+
+        await self.deliver(job, artifact)
+
+        self.jobs.pop(job["id"], None)
+        self._record({"op": "del", "id": job["id"]})
+        self._schedule_flush()
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _retry_or_give_up(self, job: dict, error: Exception) -> None:
+        job["attempts"] = int(job.get("attempts", 0)) + 1
+        job["last_error"] = str(error)
+
+        if job["attempts"] < self.max_attempts:
+            self._record({"op": "put", "job": job})
+            self._schedule_flush()
+            asyncio.get_running_loop().call_later(self._retry_delay(job["attempts"]), self._enqueue, job)
+            return
+
+        if job["stage"] == "capture":
+            # give up on the history but still deliver the close log without a transcript
+            print(f"⚠️ Transcript capture for {job.get('channel_name')} failed: {error}")
+            await self._finish_capture(job, None)
+            self._enqueue(job)
+            return
+
+        print(f"⚠️ Transcript delivery for {job.get('channel_name')} failed: {error}")
+        self.jobs.pop(job["id"], None)
+        self._record({"op": "del", "id": job["id"]})
+        self._schedule_flush()
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()